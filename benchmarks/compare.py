@@ -0,0 +1,58 @@
+"""Print the change in headline metrics between two ``benchmarks.run`` result files.
+
+    python -m benchmarks.compare old.json new.json
+"""
+import json
+import sys
+
+METRICS = [
+    ('ingest', 'chunks_per_second'),
+    ('search', 'p50_ms'),
+    ('search', 'p99_ms'),
+    ('query', 'p50_ms'),
+    ('query', 'p99_ms'),
+    ('index', 'load_seconds'),
+    ('recall', 'dense_hit_rate_at_k'),
+    ('recall', 'ann_recall_at_k'),
+    ('recall', 'quantized_recall_at_k'),
+    ('index', 'codes_bytes'),
+    (None, 'peak_rss_mb'),
+]
+
+
+def _value(result, section, key):
+    value = result.get(section, {}) if section else result
+    return value.get(key) if isinstance(value, dict) else None
+
+
+def compare(old: dict, new: dict) -> str:
+    lines = [f"{old.get('commit', '')[:10] or 'old'} -> {new.get('commit', '')[:10] or 'new'}"]
+    old_results = {r['size']: r for r in old['results']}
+    for result in new['results']:
+        before = old_results.get(result['size'])
+        if before is None or 'error' in result or 'error' in before:
+            continue
+        lines.append(f"[{result['size']}]")
+        for section, key in METRICS:
+            a, b = _value(before, section, key), _value(result, section, key)
+            if a is None or b is None:
+                continue
+            change = f"{(b - a) / a:+.1%}" if a else "n/a"
+            name = f"{section}.{key}" if section else key
+            lines.append(f"  {name:<28} {a:>12.4g} {b:>12.4g}  {change}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 2:
+        sys.exit(__doc__)
+    with open(argv[0], encoding="utf-8") as f:
+        old = json.load(f)
+    with open(argv[1], encoding="utf-8") as f:
+        new = json.load(f)
+    print(compare(old, new))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Deterministic synthetic corpora for the benchmarks.
+
+Text is drawn from a fixed vocabulary of made-up words with Zipf-like frequencies;
+every document also mixes in words of one of ``topics`` topics, so similar documents
+share vocabulary the way real ones do. The same ``seed`` always produces the same files.
+"""
+import csv
+import os
+from typing import Dict
+import numpy as np
+
+VOCAB_SIZE = 20000
+TOPIC_WORDS = 200
+
+# Approximate share of chunks produced by each file type
+MIX = {'txt': 0.4, 'csv': 0.4, 'pdf': 0.2}
+TXT_CHUNKS_PER_FILE = 200
+PDF_CHUNKS_PER_FILE = 100
+CSV_ROWS_PER_FILE = 100000
+CHUNK_CHARS = 750  # new text per chunk with the loader's 1000/250 splitter
+
+
+class TextGenerator:
+    def __init__(self, seed: int = 0, topics: int = 50):
+        self.rng = np.random.default_rng(seed)
+        letters = np.array(list("abcdefghijklmnopqrstuvwxyz"))
+        lengths = self.rng.integers(3, 10, VOCAB_SIZE)
+        self.words = np.array(["".join(self.rng.choice(letters, n)) for n in lengths])
+        weights = 1.0 / np.arange(1, VOCAB_SIZE + 1)
+        self.cdf = np.cumsum(weights) / weights.sum()
+        self.topics = [self.rng.choice(VOCAB_SIZE, TOPIC_WORDS, replace=False) for _ in range(topics)]
+
+    def words_for(self, n: int, topic: int) -> np.ndarray:
+        common = np.minimum(np.searchsorted(self.cdf, self.rng.random(n)), VOCAB_SIZE - 1)
+        topical = self.rng.choice(self.topics[topic], n)
+        return self.words[np.where(self.rng.random(n) < 0.3, topical, common)]
+
+    def paragraph(self, chars: int, topic: int) -> str:
+        text = " ".join(self.words_for(max(1, chars // 7), topic))
+        return text[:chars].rsplit(" ", 1)[0] + "."
+
+
+def _write_txt(gen: TextGenerator, path: str, chunks: int, topic: int):
+    with open(path, "w", encoding="utf-8") as f:
+        for _ in range(chunks):
+            f.write(gen.paragraph(CHUNK_CHARS, topic) + "\n\n")
+
+
+def _write_pdf_like(gen: TextGenerator, path: str, chunks: int, topic: int):
+    # Text extracted from PDFs: page headers/footers, hard line wraps and hyphenation
+    with open(path, "w", encoding="utf-8") as f:
+        for page in range(1, chunks + 1):
+            body = gen.paragraph(CHUNK_CHARS - 60, topic)
+            lines = [body[i:i + 70] for i in range(0, len(body), 70)]
+            f.write(f"Quarterly Report {topic}\n" + "-\n".join(lines) + f"\nPage {page}\n\f")
+
+
+def _write_csv(gen: TextGenerator, path: str, rows: int, first_id: int):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "name", "category", "amount", "notes"])
+        for i in range(rows):
+            topic = int(gen.rng.integers(len(gen.topics)))
+            name, category = gen.words_for(2, topic)
+            writer.writerow([first_id + i, name, category, round(float(gen.rng.random()) * 1000, 2),
+                             " ".join(gen.words_for(12, topic))])
+
+
+def generate_corpus(directory: str, chunks: int, seed: int = 0) -> Dict:
+    """Write files into ``directory`` that split into roughly ``chunks`` chunks; returns a summary."""
+    os.makedirs(directory, exist_ok=True)
+    gen = TextGenerator(seed)
+    files = {'txt': 0, 'csv': 0, 'pdf': 0}
+
+    remaining = int(chunks * MIX['txt'])
+    while remaining > 0:
+        n = min(TXT_CHUNKS_PER_FILE, remaining)
+        _write_txt(gen, os.path.join(directory, f"doc_{files['txt']:06d}.txt"), n, files['txt'] % len(gen.topics))
+        files['txt'] += 1
+        remaining -= n
+
+    remaining = int(chunks * MIX['pdf'])
+    while remaining > 0:
+        n = min(PDF_CHUNKS_PER_FILE, remaining)
+        # saved as .txt: the loaders would need a PDF writer to round-trip real PDFs
+        _write_pdf_like(gen, os.path.join(directory, f"report_{files['pdf']:06d}.txt"), n,
+                        files['pdf'] % len(gen.topics))
+        files['pdf'] += 1
+        remaining -= n
+
+    remaining = chunks - int(chunks * MIX['txt']) - int(chunks * MIX['pdf'])
+    while remaining > 0:
+        n = min(CSV_ROWS_PER_FILE, remaining)
+        _write_csv(gen, os.path.join(directory, f"table_{files['csv']:04d}.csv"), n, files['csv'] * CSV_ROWS_PER_FILE)
+        files['csv'] += 1
+        remaining -= n
+
+    size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+    return {'target_chunks': chunks, 'files': files, 'bytes': size, 'seed': seed}
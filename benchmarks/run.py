@@ -0,0 +1,209 @@
+"""Ingestion/retrieval benchmarks on synthetic corpora, fully offline.
+
+Run from the repository root:
+
+    python -m benchmarks.run --sizes 1k,100k --out results.json
+    python -m benchmarks.compare old.json new.json
+
+Every size runs in its own child process so peak RSS is per size. Results
+(throughput, latency percentiles, peak RSS, recall) are written as JSON together
+with the git commit, so runs can be compared across commits.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+import numpy as np
+
+SIZES = {'1k': 1000, '10k': 10000, '100k': 100000, '1m': 1000000}
+
+
+def _percentiles(seconds: List[float]) -> Dict:
+    values = np.asarray(seconds, dtype=np.float64) * 1000
+    if not values.size:
+        return {}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {'count': int(values.size), 'mean_ms': float(values.mean()), 'p50_ms': float(p50),
+            'p95_ms': float(p95), 'p99_ms': float(p99), 'max_ms': float(values.max())}
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+
+def _sample_queries(store, count: int, words: int, seed: int):
+    """Word windows cut from random stored chunks; each query's source chunk is its expected hit."""
+    rng = np.random.default_rng(seed)
+    queries, expected = [], []
+    for row in rng.choice(len(store), min(count, len(store)), replace=False):
+        tokens = store.texts[row].split()
+        start = int(rng.integers(0, max(1, len(tokens) - words)))
+        queries.append(" ".join(tokens[start:start + words]))
+        expected.append(int(row))
+    return queries, expected
+
+
+def _hit_rate(rankings: List[List[int]], expected: List[int]) -> float:
+    return float(np.mean([row in ranked for ranked, row in zip(rankings, expected)])) if expected else 0.0
+
+
+def run_size(label: str, args) -> Dict:
+    if args.quantization:
+        os.environ['VECTOR_QUANTIZATION'] = args.quantization  # read by src.config on import
+    from src import rag_pipeline
+    from src.ann_index import recall_at_k
+    from src.metrics import metrics
+    from .corpus import generate_corpus
+    from .stubs import StubEmbedder, StubLLM
+
+    chunks = SIZES[label]
+    workdir = tempfile.mkdtemp(prefix=f"rag-bench-{label}-")
+    result = {'size': label, 'target_chunks': chunks}
+    try:
+        started = time.perf_counter()
+        result['corpus'] = generate_corpus(os.path.join(workdir, "docs"), chunks, seed=args.seed)
+        result['corpus']['generate_seconds'] = time.perf_counter() - started
+
+        StubLLM(latency=args.llm_latency).install(rag_pipeline)
+        pipeline = rag_pipeline.RAGPipeline(embedding_manager=StubEmbedder(dim=args.dim, seed=args.seed))
+        if args.mode:
+            pipeline.retrieval_mode = args.mode
+
+        started = time.perf_counter()
+        report = pipeline.ingest_documents(os.path.join(workdir, "docs"), batch_size=args.batch_size,
+                                           progress=lambda info: None)
+        seconds = time.perf_counter() - started
+        stored = len(pipeline.vector_store)
+        result['ingest'] = {
+            'seconds': seconds, 'chunks': stored, 'chunks_per_second': stored / seconds,
+            'mb_per_second': result['corpus']['bytes'] / (1 << 20) / seconds, 'errors': len(report['errors']),
+            'stages': {stage: {k: t[k] for k in ('count', 'sum', 'p50', 'p95', 'p99')}
+                       for stage, t in metrics.snapshot()['timers'].items()},
+        }
+
+        index_dir = os.path.join(workdir, "index")
+        started = time.perf_counter()
+        pipeline.save_index(index_dir)
+        result['index'] = {'save_seconds': time.perf_counter() - started,
+                           'bytes': sum(os.path.getsize(os.path.join(index_dir, name)) for name in os.listdir(index_dir))}
+        started = time.perf_counter()
+        pipeline.load_index(index_dir)
+        result['index']['load_seconds'] = time.perf_counter() - started
+        result['index']['ann'] = pipeline.vector_store.ann is not None
+        quantizer = pipeline.vector_store.quantizer
+        result['index']['quantization'] = quantizer.mode if quantizer is not None else "none"
+        result['index']['codes_bytes'] = quantizer.nbytes if quantizer is not None else 0
+
+        queries, expected = _sample_queries(pipeline.vector_store, args.queries, args.query_words, args.seed)
+        store = pipeline.vector_store
+        vectors = pipeline.embedding_manager.embed(queries)
+
+        search_times, rankings = [], []
+        for vector in vectors:
+            started = time.perf_counter()
+            ids, _ = store.rank(vector, args.top_k)
+            search_times.append(time.perf_counter() - started)
+            rankings.append(ids.tolist())
+        result['search'] = _percentiles(search_times)
+
+        started = time.perf_counter()
+        exact = store.search_batch(vectors, top_k=args.top_k, exact=True)
+        result['search_batch'] = {'queries': len(queries), 'seconds': time.perf_counter() - started}
+
+        query_times = []
+        for question in queries:
+            started = time.perf_counter()
+            pipeline.query(question)
+            query_times.append(time.perf_counter() - started)
+        result['query'] = _percentiles(query_times)
+
+        # hit rate: how often the chunk a query was cut from comes back in the top k
+        result['recall'] = {'k': args.top_k, 'dense_hit_rate_at_k': _hit_rate(rankings, expected),
+                            'dense_exact_hit_rate_at_k': _hit_rate([[r['id'] for r in row] for row in exact], expected)}
+        if store.lexical is None:
+            store.enable_lexical()
+        lexical = [store.lexical.search(q, args.top_k)[0].tolist() for q in queries]
+        result['recall']['lexical_hit_rate_at_k'] = _hit_rate(lexical, expected)
+        if store.ann is not None:
+            result['recall']['ann_recall_at_k'] = recall_at_k(store, vectors[:100], k=args.top_k)
+        if store.quantizer is not None:
+            # overlap of the quantized (+ re-ranked) top k with the exact float32 top k
+            result['recall']['quantized_recall_at_k'] = float(np.mean(
+                [len(set(ranked) & {r['id'] for r in row}) / max(1, len(row)) for ranked, row in zip(rankings, exact)]))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    result['peak_rss_mb'] = _peak_rss_mb()
+    return result
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return ""
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1k,100k", help=f"comma-separated, from {', '.join(SIZES)}")
+    parser.add_argument("--out", default="", help="write JSON results here (default: stdout)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--query-words", type=int, default=8)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--mode", default="", help="override RETRIEVAL_MODE (dense/lexical/hybrid)")
+    parser.add_argument("--quantization", default="", help="override VECTOR_QUANTIZATION (float16/int8/pq)")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="seconds the stub LLM sleeps per call")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--child", default="", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        json.dump(run_size(args.child, args), sys.stdout)
+        return
+
+    results = []
+    for label in [s.strip().lower() for s in args.sizes.split(",") if s.strip()]:
+        if label not in SIZES:
+            parser.error(f"unknown size {label!r}")
+        print(f"Benchmarking {label} chunks...", file=sys.stderr)
+        child_args = [a for a in (argv if argv is not None else sys.argv[1:])]
+        proc = subprocess.run([sys.executable, "-m", "benchmarks.run", *child_args, "--child", label],
+                              capture_output=True, text=True)
+        if proc.returncode != 0:
+            print(proc.stderr, file=sys.stderr)
+            results.append({'size': label, 'error': proc.stderr.strip().splitlines()[-1:]})
+            continue
+        # the pipeline prints progress to stdout; the JSON result is the last line
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    output = {
+        'commit': _git_commit(),
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'args': {k: v for k, v in vars(args).items() if k != "child"},
+        'results': results,
+    }
+    text = json.dumps(output, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+        print(f"Results written to {args.out}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Offline stand-ins for the embedding model and the LLM endpoint."""
+import asyncio
+import time
+from typing import Iterator, List
+import numpy as np
+
+
+class StubEmbedder:
+    """Deterministic dense embedder with the ``EmbeddingManager`` interface.
+
+    Word uni/bigrams are hashed into ``features`` buckets and projected to ``dim``
+    dimensions with a fixed random matrix, so texts sharing words get similar vectors
+    and results do not depend on a downloaded model.
+    """
+
+    is_sparse = False
+
+    def __init__(self, dim: int = 384, features: int = 1 << 14, seed: int = 0):
+        from sklearn.feature_extraction.text import HashingVectorizer
+        self.dim = dim
+        self.vectorizer = HashingVectorizer(n_features=features, ngram_range=(1, 2), alternate_sign=False,
+                                            norm="l2", dtype=np.float32)
+        self.projection = np.random.default_rng(seed).standard_normal((features, dim)).astype(np.float32)
+
+    def embed(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        return np.asarray(self.vectorizer.transform(texts) @ self.projection, dtype=np.float32)
+
+    def save(self, path: str):
+        pass
+
+    def load(self, path: str):
+        pass
+
+
+class StubLLM:
+    """Deterministic answers (the first context line) after an optional fixed ``latency``."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = 0
+
+    @staticmethod
+    def _answer(prompt: str) -> str:
+        context = prompt.split("CONTEXT FROM DOCUMENTS:", 1)[-1].strip()
+        return context.split("\n", 1)[0][:200]
+
+    def generate(self, prompt: str) -> str:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return self._answer(prompt)
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        yield from self.generate(prompt).split(" ")
+
+    async def agenerate(self, prompt: str) -> str:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._answer(prompt)
+
+    def install(self, pipeline_module):
+        """Point the pipeline module's LLM functions at this stub."""
+        pipeline_module.generate_answer = self.generate
+        pipeline_module.stream_answer = self.stream
+        pipeline_module.agenerate_answer = self.agenerate
@@ -0,0 +1,126 @@
+import numpy as np
+from typing import Tuple
+from .array_files import load_arrays, save_arrays
+
+
+class IVFIndex:
+    """Inverted-file index over L2-normalized rows of a ``VectorStore``.
+
+    Rows are clustered with spherical k-means into ``nlist`` cells. A query scores the
+    centroids, then scores exactly only the rows of the ``nprobe`` closest cells, so cost
+    is roughly ``nprobe / nlist`` of a brute-force scan. The index stores only the cell
+    assignment of every row; vectors stay in the store's matrix.
+    """
+
+    _TRAIN_POINTS_PER_LIST = 64
+    _ASSIGN_BLOCK = 16384
+
+    def __init__(self, nlist: int, nprobe: int = 8, seed: int = 0):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.seed = seed
+        self.centroids = None
+        self.assignments = np.empty(0, dtype=np.int32)
+        self.trained_rows = 0
+        self._lists = None  # (order, offsets) CSR view of assignments, rebuilt lazily
+
+    def __len__(self) -> int:
+        return self.assignments.shape[0]
+
+    @staticmethod
+    def default_nlist(num_rows: int) -> int:
+        return max(1, int(4 * np.sqrt(num_rows)))
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        out = np.empty(vectors.shape[0], dtype=np.int32)
+        for start in range(0, vectors.shape[0], self._ASSIGN_BLOCK):
+            block = np.asarray(vectors[start:start + self._ASSIGN_BLOCK], dtype=np.float32)
+            out[start:start + block.shape[0]] = np.argmax(block @ self.centroids.T, axis=1)
+        return out
+
+    def train(self, vectors: np.ndarray, iterations: int = 10):
+        """Fit centroids with spherical k-means on a sample of ``vectors`` (rows must be normalized)."""
+        rng = np.random.default_rng(self.seed)
+        n = vectors.shape[0]
+        self.nlist = min(self.nlist, n)
+        sample_size = min(n, self.nlist * self._TRAIN_POINTS_PER_LIST)
+        sample = np.asarray(vectors[np.sort(rng.choice(n, sample_size, replace=False))], dtype=np.float32)
+
+        self.centroids = sample[rng.choice(sample_size, self.nlist, replace=False)].copy()
+        for _ in range(iterations):
+            labels = self._assign(sample)
+            order = np.argsort(labels, kind="stable")
+            counts = np.bincount(labels, minlength=self.nlist)
+            sums = np.zeros_like(self.centroids)
+            present = np.flatnonzero(counts)
+            starts = np.concatenate([[0], np.cumsum(counts[present])[:-1]])
+            sums[present] = np.add.reduceat(sample[order], starts, axis=0)
+            empty = counts == 0
+            if empty.any():
+                # Re-seed empty cells with random sample points
+                sums[empty] = sample[rng.choice(sample_size, int(empty.sum()), replace=False)]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            self.centroids = sums / norms
+        self.trained_rows = n
+        self.assignments = np.empty(0, dtype=np.int32)
+        self._lists = None
+
+    def add(self, vectors: np.ndarray):
+        """Assign new rows (appended to the store in the same order) to their nearest cells."""
+        if self.centroids is None:
+            raise ValueError("IVFIndex must be trained before adding vectors")
+        self.assignments = np.concatenate([self.assignments, self._assign(vectors)])
+        self._lists = None
+
+    def keep(self, mask: np.ndarray):
+        """Drop the cell assignments of rows the store removed (``mask`` False); centroids are unchanged."""
+        self.assignments = self.assignments[mask]
+        self._lists = None
+
+    def needs_retrain(self) -> bool:
+        """Whether k-means should be re-run: more than 4x the rows the centroids were fitted on are assigned."""
+        return len(self) > 4 * max(self.trained_rows, 1)
+
+    def _inverted_lists(self) -> Tuple[np.ndarray, np.ndarray]:
+        if self._lists is None:
+            order = np.argsort(self.assignments, kind="stable").astype(np.int64)
+            offsets = np.zeros(self.nlist + 1, dtype=np.int64)
+            np.cumsum(np.bincount(self.assignments, minlength=self.nlist), out=offsets[1:])
+            self._lists = (order, offsets)
+        return self._lists
+
+    def candidates(self, query: np.ndarray, nprobe: int = None) -> np.ndarray:
+        """Row ids in the ``nprobe`` cells closest to the normalized ``query``."""
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        centroid_scores = self.centroids @ query
+        if nprobe < self.nlist:
+            probe = np.argpartition(centroid_scores, -nprobe)[-nprobe:]
+        else:
+            probe = np.arange(self.nlist)
+        order, offsets = self._inverted_lists()
+        return np.concatenate([order[offsets[c]:offsets[c + 1]] for c in probe])
+
+    def save(self, path: str):
+        save_arrays(path, centroids=self.centroids, assignments=self.assignments,
+                    params=np.array([self.nlist, self.nprobe, self.seed, self.trained_rows], dtype=np.int64))
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "IVFIndex":
+        data = load_arrays(path, mmap)
+        nlist, nprobe, seed, trained_rows = (int(v) for v in data["params"])
+        index = cls(nlist, nprobe=nprobe, seed=seed)
+        index.centroids = data["centroids"]
+        index.assignments = data["assignments"]
+        index.trained_rows = trained_rows
+        return index
+
+
+def recall_at_k(store, queries: np.ndarray, k: int = 10, nprobe: int = None) -> float:
+    """Fraction of the exact top-``k`` rows that the store's approximate search also returns."""
+    hits = 0
+    for query in np.atleast_2d(queries):
+        exact, _ = store.rank(query, k, exact=True)
+        approx, _ = store.rank(query, k, nprobe=nprobe)
+        hits += len(np.intersect1d(exact, approx))
+    return hits / (k * np.atleast_2d(queries).shape[0])
@@ -1,13 +1,38 @@
 import os
 import tempfile
+import time
 import streamlit as st
 from src.rag_pipeline import RAGPipeline
-from src.config import DOCS_PATH
+from src.embeddings import get_embedding_manager
+from src.metrics import metrics, profile_call
+from src.config import DOCS_PATH, INDEX_PATH, METRICS_PORT, APP_SHARED_INDEX
+
+
+@st.cache_resource
+def shared_embedding_manager():
+    # Loaded once per server process and shared by every session and rerun
+    return get_embedding_manager()
+
+
+@st.cache_resource
+def metrics_server():
+    return metrics.serve(METRICS_PORT) if METRICS_PORT else None
 
 
 st.set_page_config(page_title="RAG Chat", layout="wide")
+metrics_server()
 if 'pipeline' not in st.session_state:
     st.session_state.pipeline = None
+    # Without a shared index each session's documents stay in its own in-memory pipeline
+    if APP_SHARED_INDEX:
+        # Serve straight from the shared saved index instead of re-ingesting after a restart
+        _pipeline = RAGPipeline(embedding_manager=shared_embedding_manager())
+        try:
+            if _pipeline.load_index(INDEX_PATH):
+                _pipeline.warm_up()
+                st.session_state.pipeline = _pipeline
+        except ValueError as e:
+            st.warning(f"Saved index not loaded: {e}")
 if 'chat_history' not in st.session_state:
     st.session_state.chat_history = []
 
@@ -19,28 +44,53 @@ with st.sidebar:
     if st.button("Ingest Documents"):
         with st.spinner("Loading..."):
             try:
-                # save uploaded files to a temporary directory if any
-                tmp_dir = None
+                # save uploaded files to this session's own upload directory, kept across reruns
+                # so unchanged files are skipped on re-ingest
+                upload_dir = None
                 if uploaded_files:
                     st.info(f"Uploading {len(uploaded_files)} files: {', '.join([f.name for f in uploaded_files])}")
-                    tmp_dir = tempfile.mkdtemp(prefix="st_upload_")
+                    if 'upload_dir' not in st.session_state:
+                        st.session_state.upload_dir = tempfile.mkdtemp(prefix="st_upload_")
+                    upload_dir = st.session_state.upload_dir
+                    names = {up.name for up in uploaded_files}
+                    for stale in os.listdir(upload_dir):
+                        if stale not in names:
+                            os.remove(os.path.join(upload_dir, stale))
                     for up in uploaded_files:
-                        save_path = os.path.join(tmp_dir, up.name)
+                        save_path = os.path.join(upload_dir, up.name)
                         with open(save_path, "wb") as f:
                             f.write(up.getbuffer())
-                    st.info(f"Saved to: {tmp_dir}")
+                    st.info(f"Saved to: {upload_dir}")
                 else:
                     st.warning("No files uploaded - using default directory")
 
-                st.session_state.pipeline = RAGPipeline()
-                if tmp_dir:
-                    result = st.session_state.pipeline.ingest_documents(directory=tmp_dir)
+                if st.session_state.pipeline is None:
+                    st.session_state.pipeline = RAGPipeline(embedding_manager=shared_embedding_manager())
+                progress_bar = st.progress(0.0, text="Embedding...")
+
+                def show_progress(info):
+                    done = info['files_done'] / info['files_total'] if info['files_total'] else 1.0
+                    progress_bar.progress(min(done, 1.0), text=f"{info['chunks_done']} chunks embedded "
+                                                               f"({info['files_done']}/{info['files_total']} files)")
+
+                if upload_dir:
+                    result = st.session_state.pipeline.ingest_documents(directory=upload_dir, progress=show_progress)
                 else:
-                    result = st.session_state.pipeline.ingest_documents()
+                    result = st.session_state.pipeline.ingest_documents(progress=show_progress)
+                progress_bar.empty()
+
+                if APP_SHARED_INDEX:
+                    # only the shared index is ever loaded again, so only it is worth writing
+                    st.session_state.pipeline.save_index(INDEX_PATH)
 
                 num_chunks = len(st.session_state.pipeline.vector_store.texts)
                 sources = result.get('sources', [])
                 st.success(f" Loaded {num_chunks} chunks from {len(sources)} documents")
+                st.caption(f"{len(result['added'])} added, {len(result['skipped'])} unchanged, "
+                           f"{len(result['removed'])} removed ({result['chunks_added']} chunks embedded, "
+                           f"{result['chunks_removed']} chunks dropped)")
+                for err in result.get('errors', []):
+                    st.warning(f"Could not load {os.path.basename(err['source'])}: {err['error']}")
                 if sources:
                     st.write("**Documents:**")
                     for s in sources:
@@ -48,14 +98,39 @@ with st.sidebar:
             except Exception as e:
                 st.error(f"Error: {str(e)}")
 
-    # Add chunk visibility toggle
+    # Restrict answers to selected documents (empty = all)
     st.divider()
+    selected_documents = []
+    if st.session_state.pipeline is not None and st.session_state.pipeline.loaded_files:
+        selected_documents = st.multiselect("Ask about", st.session_state.pipeline.loaded_files,
+                                            format_func=os.path.basename, placeholder="All documents")
+    filters = {'sources': selected_documents} if selected_documents else None
+
+    # Add chunk visibility toggle
     show_chunks = st.checkbox("Show retrieved chunks", value=False, help="Display the actual text chunks used to generate answers")
 
     if st.button("Clear Chat"):
         st.session_state.chat_history = []
         st.rerun()
 
+    if st.session_state.pipeline is not None:
+        startup = st.session_state.pipeline.startup
+        st.caption("Startup: " + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in startup.items()
+                                           if seconds is not None))
+
+    profile_next = st.checkbox("Profile next question (cProfile)", value=False)
+    with st.expander("Metrics"):
+        snapshot = metrics.snapshot()
+        if snapshot['timers']:
+            st.dataframe([{'stage': stage, 'count': t['count'], 'p50 ms': t['p50'] * 1000,
+                           'p95 ms': t['p95'] * 1000, 'p99 ms': t['p99'] * 1000}
+                          for stage, t in snapshot['timers'].items()], hide_index=True)
+        for name, value in snapshot['counters'].items():
+            st.write(f"{name}: {value:g}")
+        for cache, rate in snapshot['cache_hit_rates'].items():
+            st.write(f"{cache} cache hit rate: {rate:.0%}")
+        st.download_button("Download Prometheus metrics", metrics.prometheus(), file_name="metrics.prom")
+
 
 for message in st.session_state.chat_history:
     with st.chat_message(message["role"]):
@@ -71,9 +146,39 @@ if prompt := st.chat_input("Ask a question..."):
 
         with st.chat_message("assistant"):
             try:
-                result = st.session_state.pipeline.query(prompt, show_chunks=show_chunks)
-                st.markdown(result["answer"])
-                st.caption(f" {result['source_used']} chunks")
+                started = time.perf_counter()
+                first_token = {}
+
+                def timed_tokens(tokens):
+                    for token in tokens:
+                        first_token.setdefault('latency', time.perf_counter() - started)
+                        yield token
+
+                if profile_next:
+                    # Profile the whole request, including consuming the answer stream
+                    def profiled_query():
+                        profiled = st.session_state.pipeline.query_stream(prompt, show_chunks=show_chunks,
+                                                                          filters=filters)
+                        profiled["answer"] = "".join(timed_tokens(profiled["answer"]))
+                        return profiled
+
+                    result, profile_report = profile_call(profiled_query)
+                    st.markdown(result["answer"])
+                    with st.expander("cProfile report"):
+                        st.code(profile_report)
+                else:
+                    result = st.session_state.pipeline.query_stream(prompt, show_chunks=show_chunks, filters=filters)
+                    result["answer"] = st.write_stream(timed_tokens(result["answer"]))
+                caption = f" {result['source_used']} chunks"
+                if result.get('cached'):
+                    caption += " (cached answer)"
+                elif 'latency' in first_token:
+                    caption += f" · first token {first_token['latency']:.2f}s, total {time.perf_counter() - started:.2f}s"
+                if result.get('context'):
+                    context = result['context']
+                    caption += (f" · context {context['tokens_used']}/{context['budget']} tokens "
+                                f"({context['tokens_saved']} saved)")
+                st.caption(caption)
 
                 # Show retrieved chunks if enabled
                 if result.get('chunks'):
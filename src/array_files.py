@@ -0,0 +1,20 @@
+import os
+import numpy as np
+from typing import Dict
+
+
+def save_arrays(path: str, **arrays: np.ndarray):
+    """Write each array into directory ``path`` as ``<name>.npy``."""
+    os.makedirs(path, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(path, f"{name}.npy"), np.asarray(array))
+
+
+def load_arrays(path: str, mmap: bool = True) -> Dict[str, np.ndarray]:
+    """Arrays written by ``save_arrays``, memory-mapped read-only with ``mmap``.
+
+    Mapped arrays live in the OS page cache, so processes serving the same index share
+    one copy.
+    """
+    return {name[:-len(".npy")]: np.load(os.path.join(path, name), mmap_mode="r" if mmap else None)
+            for name in os.listdir(path) if name.endswith(".npy")}
@@ -0,0 +1,342 @@
+import hashlib
+import json
+import mmap
+import os
+from array import array
+from collections.abc import Sequence
+import numpy as np
+from typing import Dict, List, Tuple
+
+_MISSING = -(1 << 63)  # int column value for rows without the key
+
+
+def text_hash(text: str) -> int:
+    """64-bit content hash used to deduplicate chunk texts."""
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _intern_key(value):
+    try:
+        hash(value)
+        return type(value), value  # keeps 1, 1.0 and True apart
+    except TypeError:
+        return "json", json.dumps(value, sort_keys=True, default=str)
+
+
+class _Column:
+    """One metadata key over all rows.
+
+    Integer values (tabular row numbers) are stored inline in an int64 array; as soon as
+    any other value shows up the column switches to interned mode: each distinct value
+    is kept once and rows hold an int32 code (-1 when the row lacks the key).
+    """
+
+    def __init__(self, rows: int = 0):
+        self.ints = array("q", [_MISSING]) * rows
+        self.codes = None
+        self.values = None
+        self._index = None
+
+    def __len__(self) -> int:
+        return len(self.ints) if self.codes is None else len(self.codes)
+
+    def _intern(self, value) -> int:
+        key = _intern_key(value)
+        code = self._index.get(key)
+        if code is None:
+            code = self._index[key] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def _to_interned(self):
+        self.values, self._index = [], {}
+        self.codes = array("i", (-1 if v == _MISSING else self._intern(v) for v in self.ints))
+        self.ints = None
+
+    def append(self, value, present: bool = True):
+        if self.codes is None:
+            if not present:
+                self.ints.append(_MISSING)
+                return
+            if type(value) is int and value != _MISSING:
+                self.ints.append(value)
+                return
+            self._to_interned()
+        self.codes.append(self._intern(value) if present else -1)
+
+    def get(self, row: int):
+        """``(present, value)`` of ``row``."""
+        if self.codes is None:
+            value = self.ints[row]
+            return value != _MISSING, value
+        code = self.codes[row]
+        return code >= 0, (self.values[code] if code >= 0 else None)
+
+    def encoded(self) -> Tuple[List, np.ndarray]:
+        """Distinct values and a per-row int64 code into them (-1 = missing)."""
+        if self.codes is not None:
+            return self.values, np.frombuffer(self.codes, dtype=np.int32).astype(np.int64)
+        ints = np.frombuffer(self.ints, dtype=np.int64)
+        present = ints != _MISSING
+        values, inverse = np.unique(ints[present], return_inverse=True)
+        codes = np.full(ints.shape[0], -1, dtype=np.int64)
+        codes[present] = inverse
+        return values.tolist(), codes
+
+    def keep(self, mask: np.ndarray):
+        if self.codes is None:
+            self.ints = array("q", np.frombuffer(self.ints, dtype=np.int64)[mask].tobytes())
+            return
+        codes = np.frombuffer(self.codes, dtype=np.int32)[mask]
+        # drop values no kept row refers to any more
+        used = np.unique(codes[codes >= 0])
+        remap = np.full(len(self.values) + 1, -1, dtype=np.int32)
+        remap[used] = np.arange(used.shape[0], dtype=np.int32)
+        self.values = [self.values[i] for i in used.tolist()]
+        self._index = {_intern_key(v): i for i, v in enumerate(self.values)}
+        self.codes = array("i", remap[codes].tobytes())
+
+    def state(self) -> Tuple[Dict, np.ndarray]:
+        if self.codes is None:
+            return {'values': None}, np.frombuffer(self.ints, dtype=np.int64)
+        return {'values': self.values}, np.frombuffer(self.codes, dtype=np.int32)
+
+    @classmethod
+    def from_state(cls, header: Dict, data: np.ndarray) -> "_Column":
+        column = cls()
+        if header['values'] is None:
+            column.ints = array("q", np.asarray(data, dtype=np.int64).tobytes())
+        else:
+            column.ints = None
+            column.values = header['values']
+            column._index = {_intern_key(v): i for i, v in enumerate(column.values)}
+            column.codes = array("i", np.asarray(data, dtype=np.int32).tobytes())
+        return column
+
+
+class _Rows(Sequence):
+    """Read-only list-like view that materializes one row at a time."""
+
+    def __init__(self, store: "ChunkStore", getter):
+        self._store = store
+        self._getter = getter
+
+    def __len__(self) -> int:
+        return len(self._store)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._getter(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("chunk index out of range")
+        return self._getter(index)
+
+
+class ChunkStore:
+    """Chunk texts and metadata kept compact, row-aligned with a ``VectorStore``.
+
+    Each source's text lives once in a contiguous UTF-8 buffer and a chunk is a
+    ``(source_id, offset, length)`` row into it: when a chunk starts with the tail of
+    the previous one (the splitter's overlap) only the new part is appended. Metadata
+    is column-oriented with interned values (see ``_Column``). ``texts`` and
+    ``metadatas`` are list-like views that decode a row on access; after ``load`` the
+    buffers are slices of a read-only memory map shared through the page cache.
+    A 64-bit hash per chunk lets ``unseen`` skip chunks already stored for their source.
+    """
+
+    TEXT_FILE = "chunk_text.bin"
+    ARRAYS_FILE = "chunk_rows.npz"
+    _TAIL_BYTES = 4096  # end of a source buffer searched for the overlap with a new chunk
+    _PROBE_CHARS = 16
+
+    def __init__(self):
+        self.sources: List[str] = []  # source id -> source (metadata "source", None if absent)
+        self._source_ids: Dict = {}
+        self._buffers: List = []  # per source: bytearray, or a read-only memoryview after load
+        self._source_id = array("i")
+        self._offset = array("q")
+        self._length = array("i")
+        self._hash = array("Q")
+        self._columns: Dict[str, _Column] = {}
+        self._seen = None  # per source id: set of chunk hashes, built lazily
+        self._mmap = None
+
+    def __len__(self) -> int:
+        return len(self._offset)
+
+    @property
+    def texts(self) -> _Rows:
+        return _Rows(self, self.text)
+
+    @property
+    def metadatas(self) -> _Rows:
+        return _Rows(self, self.metadata)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by text buffers and row arrays (Python objects for interned values excluded)."""
+        arrays = [self._source_id, self._offset, self._length, self._hash]
+        arrays += [c.ints if c.codes is None else c.codes for c in self._columns.values()]
+        return sum(len(b) for b in self._buffers) + sum(a.itemsize * len(a) for a in arrays)
+
+    def text(self, row: int) -> str:
+        start = self._offset[row]
+        return self.slice(self._source_id[row], start, start + self._length[row])
+
+    def span(self, row: int) -> Tuple[int, int, int]:
+        """``(source_id, start, end)`` byte range of ``row`` in its source buffer."""
+        start = self._offset[row]
+        return self._source_id[row], start, start + self._length[row]
+
+    def slice(self, source_id: int, start: int, end: int) -> str:
+        """Text of bytes ``start:end`` of a source buffer (both must fall on chunk boundaries)."""
+        return str(memoryview(self._buffers[source_id])[start:end], "utf-8")
+
+    def metadata(self, row: int) -> Dict:
+        meta = {}
+        for key, column in self._columns.items():
+            present, value = column.get(row)
+            if present:
+                meta[key] = value
+        return meta
+
+    def _source(self, source) -> int:
+        key = _intern_key(source)
+        sid = self._source_ids.get(key)
+        if sid is None:
+            sid = self._source_ids[key] = len(self.sources)
+            self.sources.append(source)
+            self._buffers.append(bytearray())
+            if self._seen is not None:
+                self._seen.append(set())
+        elif not isinstance(self._buffers[sid], bytearray):
+            self._buffers[sid] = bytearray(self._buffers[sid])  # copy a mapped buffer before appending
+        return sid
+
+    def _place(self, buffer: bytearray, text: str) -> int:
+        """Byte offset of ``text`` in ``buffer``, appending only what is not already at its end."""
+        tail = str(memoryview(buffer)[-self._TAIL_BYTES:], "utf-8", "ignore")
+        if text:
+            found = tail.rfind(text)
+            if found >= 0:
+                return len(buffer) - len(tail[found:].encode("utf-8"))
+            probe = text[:self._PROBE_CHARS]
+            position = tail.find(probe)
+            while position >= 0:
+                # leftmost match = longest overlap between the end of the buffer and the chunk start
+                if text.startswith(tail[position:]):
+                    overlap = tail[position:]
+                    start = len(buffer) - len(overlap.encode("utf-8"))
+                    buffer += text[len(overlap):].encode("utf-8")
+                    return start
+                position = tail.find(probe, position + 1)
+        start = len(buffer)
+        buffer += text.encode("utf-8")
+        return start
+
+    def add(self, texts: List[str], metadatas: List[Dict] = None):
+        metadatas = metadatas or [None] * len(texts)
+        for text, meta in zip(texts, metadatas):
+            meta = meta or {}
+            sid = self._source(meta.get('source'))
+            self._offset.append(self._place(self._buffers[sid], text))
+            self._length.append(len(text.encode("utf-8")))
+            self._source_id.append(sid)
+            chunk_hash = text_hash(text)
+            self._hash.append(chunk_hash)
+            if self._seen is not None:
+                self._seen[sid].add(chunk_hash)
+            rows = len(self._offset) - 1
+            for key in meta:
+                if key not in self._columns:
+                    self._columns[key] = _Column(rows)
+            for key, column in self._columns.items():
+                column.append(meta.get(key), key in meta)
+
+    def unseen(self, texts: List[str], metadatas: List[Dict] = None) -> List[int]:
+        """Positions of the chunks whose text is not stored yet for their source (nor repeated earlier in the batch)."""
+        if self._seen is None:
+            self._seen = [set() for _ in self.sources]
+            for sid, chunk_hash in zip(self._source_id, self._hash):
+                self._seen[sid].add(chunk_hash)
+        metadatas = metadatas or [None] * len(texts)
+        batch_seen = set()
+        fresh = []
+        for i, (text, meta) in enumerate(zip(texts, metadatas)):
+            source = (meta or {}).get('source')
+            sid = self._source_ids.get(_intern_key(source))
+            chunk_hash = text_hash(text)
+            if (sid is not None and chunk_hash in self._seen[sid]) or (_intern_key(source), chunk_hash) in batch_seen:
+                continue
+            batch_seen.add((_intern_key(source), chunk_hash))
+            fresh.append(i)
+        return fresh
+
+    def column(self, key: str) -> Tuple[List, np.ndarray]:
+        """Distinct values of metadata ``key`` and each row's code into them (-1 = missing)."""
+        if key not in self._columns:
+            return [], np.full(len(self), -1, dtype=np.int64)
+        return self._columns[key].encoded()
+
+    def keep(self, mask: np.ndarray):
+        """Keep only rows where ``mask`` is True; buffers of sources left without rows are dropped."""
+        source_id = np.frombuffer(self._source_id, dtype=np.int32)[mask]
+        used = np.unique(source_id)
+        remap = np.full(len(self.sources) + 1, -1, dtype=np.int32)
+        remap[used] = np.arange(used.shape[0], dtype=np.int32)
+        self.sources = [self.sources[i] for i in used.tolist()]
+        self._buffers = [self._buffers[i] for i in used.tolist()]
+        self._source_ids = {_intern_key(s): i for i, s in enumerate(self.sources)}
+        self._source_id = array("i", remap[source_id].tobytes())
+        self._offset = array("q", np.frombuffer(self._offset, dtype=np.int64)[mask].tobytes())
+        self._length = array("i", np.frombuffer(self._length, dtype=np.int32)[mask].tobytes())
+        self._hash = array("Q", np.frombuffer(self._hash, dtype=np.uint64)[mask].tobytes())
+        for column in self._columns.values():
+            column.keep(mask)
+        self._seen = None
+
+    def save(self, path: str) -> Dict:
+        """Write the text buffers and row arrays into directory ``path``; returns the JSON header to keep with them."""
+        sizes = [len(b) for b in self._buffers]
+        with open(os.path.join(path, self.TEXT_FILE), "wb") as f:
+            for buffer in self._buffers:
+                f.write(buffer)
+        columns, arrays = [], {}
+        for i, (key, column) in enumerate(self._columns.items()):
+            header, data = column.state()
+            columns.append({'key': key, **header})
+            arrays[f"column_{i}"] = data
+        np.savez(os.path.join(path, self.ARRAYS_FILE),
+                 source_id=np.frombuffer(self._source_id, dtype=np.int32),
+                 offset=np.frombuffer(self._offset, dtype=np.int64),
+                 length=np.frombuffer(self._length, dtype=np.int32),
+                 hash=np.frombuffer(self._hash, dtype=np.uint64), **arrays)
+        return {'sources': self.sources, 'buffer_sizes': sizes, 'columns': columns}
+
+    @classmethod
+    def load(cls, path: str, header: Dict, mmap_text: bool = True) -> "ChunkStore":
+        store = cls()
+        store.sources = header['sources']
+        store._source_ids = {_intern_key(s): i for i, s in enumerate(store.sources)}
+        text_path = os.path.join(path, cls.TEXT_FILE)
+        if mmap_text and os.path.getsize(text_path):
+            with open(text_path, "rb") as f:
+                store._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            text = memoryview(store._mmap)
+        else:
+            with open(text_path, "rb") as f:
+                text = memoryview(f.read())
+        start = 0
+        for size in header['buffer_sizes']:
+            store._buffers.append(text[start:start + size])
+            start += size
+        with np.load(os.path.join(path, cls.ARRAYS_FILE)) as data:
+            store._source_id = array("i", data['source_id'].tobytes())
+            store._offset = array("q", data['offset'].tobytes())
+            store._length = array("i", data['length'].tobytes())
+            store._hash = array("Q", data['hash'].tobytes())
+            for i, column in enumerate(header['columns']):
+                store._columns[column['key']] = _Column.from_state(column, data[f"column_{i}"])
+        return store
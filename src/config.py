@@ -13,10 +13,80 @@ BASE_DIR = Path(__file__).resolve().parents[1]
 # Documents directory (default: project root / data)
 DOCS_PATH = os.getenv("DOCS_PATH", str(BASE_DIR / "data"))
 
+# Directory where the ingested index (embeddings + chunk sidecar) is persisted
+INDEX_PATH = os.getenv("INDEX_PATH", str(BASE_DIR / "index"))
+# Streamlit app: share one index at INDEX_PATH between all sessions (loaded on start, overwritten
+# by every ingest). Off by default: each session keeps its documents in memory and nothing is saved
+APP_SHARED_INDEX = os.getenv("APP_SHARED_INDEX", "false").lower() in ("1", "true", "yes")
+
+# Number of worker processes used to parse and split files during ingestion (1 = serial)
+LOADER_WORKERS = int(os.getenv("LOADER_WORKERS", str(min(8, os.cpu_count() or 1))))
+
+# Rows read per pandas chunk when streaming large CSV files
+TABULAR_CHUNK_ROWS = int(os.getenv("TABULAR_CHUNK_ROWS", "10000"))
+# Consecutive CSV/Excel rows grouped into one document (1 = one document per row)
+TABULAR_ROWS_PER_DOCUMENT = int(os.getenv("TABULAR_ROWS_PER_DOCUMENT", "1"))
+
 # Retrieval / ranking defaults
 TOP_K = int(os.getenv("TOP_K", "5"))
 MIN_SCORE_THRESHOLD = float(os.getenv("MIN_SCORE_THRESHOLD", "0.1"))
 
+# Ingestion: number of chunks embedded and appended to the store per batch
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "256"))
+
+# Hashed feature space of the fallback n-gram embeddings (used when sentence-transformers is unavailable)
+HASHING_FEATURES = int(os.getenv("HASHING_FEATURES", str(2 ** 20)))
+
+# Retrieval mode: "dense" (embeddings), "lexical" (BM25), "hybrid" (both, fused with
+# reciprocal rank fusion) or "auto" (hybrid when the hashed n-gram fallback embeddings are in use)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "auto").lower()
+
+# Approximate search (opt-in): an IVF index is built once the store holds ANN_MIN_ROWS chunks;
+# 0 (the default) keeps every search exact. IVF trades recall for speed, so check it with
+# ``recall_at_k`` on your own embeddings before enabling it.
+# ANN_NLIST=0 picks ~4*sqrt(rows) lists; ANN_NPROBE lists are scanned per query (higher = better recall, slower)
+ANN_MIN_ROWS = int(os.getenv("ANN_MIN_ROWS", "0"))
+ANN_NLIST = int(os.getenv("ANN_NLIST", "0"))
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "16"))
+
+# Compressed vector storage: "none" (float32), "float16", "int8" (one byte per dimension) or
+# "pq" (product quantization, PQ_SUBVECTORS bytes per vector; the dimension must divide evenly).
+# Searches scan the codes and re-score the best QUANT_RERANK candidates with the exact rows (0 = off).
+# PQ scores alone are too coarse to rank by (recall@5 around 0.2-0.5), so it re-ranks 400 by default
+VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "none").lower()
+PQ_SUBVECTORS = int(os.getenv("PQ_SUBVECTORS", "48"))
+QUANT_RERANK = int(os.getenv("QUANT_RERANK", "400" if VECTOR_QUANTIZATION == "pq" else "100"))
+
+# Prompt context: retrieved chunks are merged, de-duplicated with maximal marginal relevance
+# (CONTEXT_MMR_LAMBDA: 1 = score only, 0 = diversity only; passages at least
+# CONTEXT_DUPLICATE_THRESHOLD cosine-similar to a kept one are dropped) and packed into
+# CONTEXT_TOKEN_BUDGET tokens
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+CONTEXT_MMR_LAMBDA = float(os.getenv("CONTEXT_MMR_LAMBDA", "0.7"))
+CONTEXT_DUPLICATE_THRESHOLD = float(os.getenv("CONTEXT_DUPLICATE_THRESHOLD", "0.95"))
+
+# Query-embedding and answer caches: max entries and time-to-live in seconds (size 0 disables)
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "3600"))
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "512"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "900"))
+
+# Metrics: Prometheus text is rewritten to METRICS_FILE after every query/ingest when set,
+# and served at http://127.0.0.1:METRICS_PORT/metrics by the Streamlit app when non-zero
+METRICS_FILE = os.getenv("METRICS_FILE", "")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
+# Headless query service (python -m src.server): SERVER_WORKERS forked processes share the
+# memory-mapped index; concurrent requests are batched for up to BATCH_WINDOW_MS (at most
+# BATCH_MAX_SIZE per batch), and workers reload INDEX_PATH when it is replaced (checked every
+# INDEX_POLL_SECONDS, 0 = only on SIGHUP / POST /admin/reload)
+SERVER_HOST = os.getenv("SERVER_HOST", "127.0.0.1")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8000"))
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", str(min(4, os.cpu_count() or 1))))
+BATCH_WINDOW_MS = float(os.getenv("BATCH_WINDOW_MS", "5"))
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "32"))
+INDEX_POLL_SECONDS = float(os.getenv("INDEX_POLL_SECONDS", "2"))
+
 # If set, use only these files (comma-separated list). Otherwise None
 _spec = os.getenv("SPECIFIC_FILES", "")
 if _spec:
@@ -28,14 +98,57 @@ else:
 DATABRICKS_TOKEN = os.getenv("DATABRICKS_TOKEN", "")
 DATABRICKS_HOST = os.getenv("DATABRICKS_HOST", "")
 DATABRICKS_MODEL_ENDPOINT = os.getenv("DATABRICKS_MODEL_ENDPOINT", "")
+LLM_MODEL = os.getenv("LLM_MODEL", "databricks-meta-llama-3-1-8b-instruct")
+# Any OpenAI-compatible endpoint (e.g. a local mock server); overrides the Databricks URL when set
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "")
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+# Max in-flight async generation requests and pooled HTTP connections
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
 
 __all__ = [
     "BASE_DIR",
     "DOCS_PATH",
+    "INDEX_PATH",
+    "APP_SHARED_INDEX",
+    "LOADER_WORKERS",
+    "TABULAR_CHUNK_ROWS",
+    "TABULAR_ROWS_PER_DOCUMENT",
     "TOP_K",
     "MIN_SCORE_THRESHOLD",
+    "RETRIEVAL_MODE",
+    "ANN_MIN_ROWS",
+    "ANN_NLIST",
+    "ANN_NPROBE",
+    "VECTOR_QUANTIZATION",
+    "PQ_SUBVECTORS",
+    "QUANT_RERANK",
+    "CONTEXT_TOKEN_BUDGET",
+    "CONTEXT_MMR_LAMBDA",
+    "CONTEXT_DUPLICATE_THRESHOLD",
+    "QUERY_CACHE_SIZE",
+    "QUERY_CACHE_TTL",
+    "ANSWER_CACHE_SIZE",
+    "ANSWER_CACHE_TTL",
+    "EMBED_BATCH_SIZE",
+    "HASHING_FEATURES",
+    "METRICS_FILE",
+    "METRICS_PORT",
+    "SERVER_HOST",
+    "SERVER_PORT",
+    "SERVER_WORKERS",
+    "BATCH_WINDOW_MS",
+    "BATCH_MAX_SIZE",
+    "INDEX_POLL_SECONDS",
     "SPECIFIC_FILES",
     "DATABRICKS_TOKEN",
     "DATABRICKS_HOST",
     "DATABRICKS_MODEL_ENDPOINT",
+    "LLM_MODEL",
+    "LLM_BASE_URL",
+    "LLM_TIMEOUT",
+    "LLM_MAX_RETRIES",
+    "LLM_MAX_CONCURRENCY",
+    "LLM_MAX_CONNECTIONS",
 ]
@@ -0,0 +1,143 @@
+import re
+from functools import lru_cache
+import numpy as np
+import scipy.sparse as sp
+from typing import Dict, List, Tuple
+from .config import CONTEXT_TOKEN_BUDGET, CONTEXT_MMR_LAMBDA, CONTEXT_DUPLICATE_THRESHOLD
+
+# Words and individual punctuation marks; close to BPE counts for English prose
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+@lru_cache(maxsize=None)
+def _tiktoken_encoding():
+    # tiktoken is optional, and its BPE file may not be cached offline
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Token count of ``text`` with tiktoken's cl100k_base when available, else a regex estimate."""
+    encoding = _tiktoken_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return len(_TOKEN_PATTERN.findall(text))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """The longest prefix of ``text`` with at most ``max_tokens`` tokens."""
+    if max_tokens <= 0:
+        return ""
+    encoding = _tiktoken_encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+    for i, match in enumerate(_TOKEN_PATTERN.finditer(text)):
+        if i == max_tokens - 1:
+            return text[:match.end()]
+    return text
+
+
+class ContextBuilder:
+    """Turn retrieved chunks into the passages that go into the prompt.
+
+    1. Chunks from the same source whose byte ranges overlap or touch (the splitter's
+       overlap, consecutive CSV rows) are merged into one passage, so shared text is
+       sent once.
+    2. Passages are ordered by maximal marginal relevance: ``mmr_lambda`` weighs the
+       retrieval score against the highest cosine similarity to the passages already
+       picked, using the stored embeddings. A passage at least
+       ``duplicate_threshold`` similar to a picked one is dropped.
+    3. Passages are packed greedily into ``budget`` tokens. A passage that does not
+       fit is skipped for smaller ones, and the top passage is truncated rather than
+       dropped.
+    """
+
+    def __init__(self, budget: int = CONTEXT_TOKEN_BUDGET, mmr_lambda: float = CONTEXT_MMR_LAMBDA,
+                 duplicate_threshold: float = CONTEXT_DUPLICATE_THRESHOLD):
+        self.budget = budget
+        self.mmr_lambda = mmr_lambda
+        self.duplicate_threshold = duplicate_threshold
+
+    @staticmethod
+    def _relevance(chunk: Dict) -> float:
+        # Hybrid results carry the cosine separately from the fused score
+        return float(chunk.get('dense_score', chunk['score']))
+
+    @staticmethod
+    def _merge(chunks: List[Dict], store) -> List[Dict]:
+        """Group chunks into passages of overlapping or adjacent byte ranges per source."""
+        spans = sorted((store.chunks.span(c['id']), i) for i, c in enumerate(chunks))
+        passages = []
+        for (source_id, start, end), i in spans:
+            last = passages[-1] if passages else None
+            if last is not None and last['source_id'] == source_id and start <= last['end']:
+                if end > last['end']:
+                    if start < last['end']:
+                        # overlapping: append only the bytes past the current end
+                        last['text'] += store.chunks.slice(source_id, last['end'], end)
+                    else:
+                        last['text'] += "\n" + chunks[i]['text']
+                    last['end'] = end
+                last['members'].append(i)
+                continue
+            passages.append({'source_id': source_id, 'end': end, 'text': chunks[i]['text'], 'members': [i]})
+        return passages
+
+    @staticmethod
+    def _similarities(store, ids: List[int]) -> np.ndarray:
+        rows = store.embeddings[ids]
+        similarities = rows @ rows.T
+        return similarities.toarray() if sp.issparse(similarities) else np.asarray(similarities)
+
+    def build(self, chunks: List[Dict], store) -> Tuple[List[str], Dict]:
+        """Context passages for ``chunks`` (search results from ``store``, best first) and a token report."""
+        report = {'chunks': len(chunks), 'passages': 0, 'merged': 0, 'duplicates_dropped': 0,
+                  'over_budget_dropped': 0, 'truncated': False, 'budget': self.budget,
+                  'tokens_retrieved': sum(count_tokens(c['text']) for c in chunks), 'tokens_used': 0}
+        if not chunks:
+            report['tokens_saved'] = 0
+            return [], report
+
+        passages = self._merge(chunks, store)
+        report['merged'] = len(chunks) - len(passages)
+        relevance = np.array([self._relevance(c) for c in chunks], dtype=np.float32)
+        top = float(relevance.max())
+        relevance = relevance / top if top > 0 else np.ones_like(relevance)
+        member_similarity = self._similarities(store, [c['id'] for c in chunks])
+        # passage-to-passage similarity is the closest pair of their member chunks
+        similarity = np.array([[member_similarity[np.ix_(a['members'], b['members'])].max() for b in passages]
+                               for a in passages], dtype=np.float32)
+        scores = np.array([relevance[p['members']].max() for p in passages], dtype=np.float32)
+
+        order, remaining = [], list(range(len(passages)))
+        while remaining:
+            redundancy = similarity[np.ix_(remaining, order)].max(axis=1) if order else np.zeros(len(remaining))
+            mmr = self.mmr_lambda * scores[remaining] - (1 - self.mmr_lambda) * redundancy
+            pick = int(np.argmax(mmr))
+            if order and redundancy[pick] >= self.duplicate_threshold:
+                report['duplicates_dropped'] += len(passages[remaining[pick]]['members'])
+            else:
+                order.append(remaining[pick])
+            remaining.pop(pick)
+
+        texts, used = [], 0
+        for rank, index in enumerate(order):
+            text = passages[index]['text']
+            tokens = count_tokens(text)
+            if used + tokens > self.budget:
+                if rank:
+                    report['over_budget_dropped'] += len(passages[index]['members'])
+                    continue
+                text = truncate_tokens(text, self.budget)
+                tokens = count_tokens(text)
+                report['truncated'] = True
+            texts.append(text)
+            used += tokens
+        report['passages'] = len(texts)
+        report['tokens_used'] = used
+        report['tokens_saved'] = report['tokens_retrieved'] - used
+        return texts, report
@@ -0,0 +1,338 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import islice
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional
+import csv
+from .config import SPECIFIC_FILES, LOADER_WORKERS, TABULAR_CHUNK_ROWS, TABULAR_ROWS_PER_DOCUMENT
+
+
+TABULAR_EXTENSIONS = ('.csv', '.xls', '.xlsx')
+
+if TYPE_CHECKING:
+    from langchain.schema import Document
+
+# langchain loaders and pandas take seconds to import, so they are imported on first use
+# rather than when the pipeline module is loaded
+
+
+@lru_cache(maxsize=None)
+def _pandas():
+    try:
+        import pandas as pd
+    except Exception:
+        pd = None
+    return pd
+
+
+def _tag_source(docs: Iterable[Document], path: str) -> Iterator[Document]:
+    # Manually ensure source is in metadata
+    for doc in docs:
+        if not hasattr(doc, 'metadata') or doc.metadata is None:
+            doc.metadata = {}
+        doc.metadata['source'] = path
+        yield doc
+
+
+def _frame_row_texts(df) -> List[str]:
+    """Render every row of ``df`` as "col: value, col: value" with column-wise string ops."""
+    text = None
+    for column in df.columns:
+        part = f"{column}: " + df[column].fillna("").astype(str)
+        text = part if text is None else text + ", " + part
+    return text.tolist() if text is not None else [""] * len(df)
+
+
+def _row_documents(row_texts: List[str], path: str, first_row: int, rows_per_doc: int) -> Iterator[Document]:
+    """Wrap rendered rows into documents, ``rows_per_doc`` consecutive rows per document."""
+    from langchain.schema import Document
+    for offset in range(0, len(row_texts), rows_per_doc):
+        group = row_texts[offset:offset + rows_per_doc]
+        row = first_row + offset
+        yield Document(page_content="\n".join(group),
+                       metadata={"source": path, "row": row, "row_end": row + len(group) - 1})
+
+
+def _block_rows(rows_per_doc: int) -> int:
+    # Read blocks that are a whole number of groups so groups never straddle two blocks
+    return max(1, -(-TABULAR_CHUNK_ROWS // rows_per_doc)) * rows_per_doc
+
+
+def _iter_csv_documents(path: str, rows_per_doc: int = TABULAR_ROWS_PER_DOCUMENT) -> Iterator[Document]:
+    # try pandas first for robust parsing, else fallback to csv
+    reader = None
+    pd = _pandas()
+    if pd is not None:
+        try:
+            reader = pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=_block_rows(rows_per_doc))
+        except Exception:
+            reader = None
+    if reader is not None:
+        first_row = 0
+        with reader:
+            for frame in reader:
+                yield from _row_documents(_frame_row_texts(frame), path, first_row, rows_per_doc)
+                first_row += len(frame)
+        return
+    with open(path, encoding="utf-8", errors="ignore") as f:
+        reader = csv.reader(f)
+        headers = next(reader, None)
+        block = []
+        first_row = 0
+        for r in reader:
+            if headers:
+                block.append(", ".join([f"{h}: {v}" for h, v in zip(headers, r)]))
+            else:
+                block.append(", ".join(r))
+            if len(block) >= _block_rows(rows_per_doc):
+                yield from _row_documents(block, path, first_row, rows_per_doc)
+                first_row += len(block)
+                block = []
+        yield from _row_documents(block, path, first_row, rows_per_doc)
+
+
+def _iter_excel_documents(path: str, rows_per_doc: int = TABULAR_ROWS_PER_DOCUMENT) -> Iterator[Document]:
+    pd = _pandas()
+    if pd is None:
+        return
+    if path.endswith(".xlsx"):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            load_workbook = None
+        if load_workbook is not None:
+            # read_only streams rows from the sheet XML instead of building the whole workbook;
+            # rows are rendered a block at a time through a DataFrame
+            workbook = load_workbook(path, read_only=True, data_only=True)
+            try:
+                rows = workbook.worksheets[0].iter_rows(values_only=True)
+                headers = next(rows, None)
+                headers = [str(h) if h is not None else f"Unnamed: {j}" for j, h in enumerate(headers or [])]
+                first_row = 0
+                for block in iter(lambda: list(islice(rows, _block_rows(rows_per_doc))), []):
+                    frame = pd.DataFrame([r[:len(headers)] for r in block], columns=headers, dtype=object)
+                    yield from _row_documents(_frame_row_texts(frame), path, first_row, rows_per_doc)
+                    first_row += len(block)
+            finally:
+                workbook.close()
+            return
+    try:
+        df = pd.read_excel(path, dtype=str)
+    except Exception:
+        # if the excel engine is not available, skip
+        return
+    yield from _row_documents(_frame_row_texts(df), path, 0, rows_per_doc)
+
+
+def _iter_file_documents(path: str) -> Optional[Iterator[Document]]:
+    """Lazily parse one file into documents (pages/sections/rows); None for unsupported types."""
+    if path.endswith(".pdf"):
+        from langchain_community.document_loaders import PyPDFLoader
+        return _tag_source(PyPDFLoader(path).lazy_load(), path)
+    if path.endswith(".docx"):
+        from langchain_community.document_loaders import Docx2txtLoader
+        return _tag_source(Docx2txtLoader(path).lazy_load(), path)
+    if path.endswith(".txt"):
+        from langchain_community.document_loaders import TextLoader
+        return _tag_source(TextLoader(path, encoding="utf-8").lazy_load(), path)
+    if path.endswith(".csv"):
+        return _iter_csv_documents(path)
+    if path.endswith(".xls") or path.endswith(".xlsx"):
+        return _iter_excel_documents(path)
+    return None
+
+
+def _split_documents(documents: Iterator[Document], splitter, timings: Dict) -> Iterator[Document]:
+    # Time spent pulling the next document (parsing) and splitting it is accumulated separately
+    timings.setdefault('load', 0.0)
+    timings.setdefault('split', 0.0)
+    documents = iter(documents)
+    while True:
+        started = time.perf_counter()
+        doc = next(documents, None)
+        loaded = time.perf_counter()
+        timings['load'] += loaded - started
+        if doc is None:
+            return
+        chunks = splitter.split_documents([doc])
+        timings['split'] += time.perf_counter() - loaded
+        yield from chunks
+
+
+def _iter_file_chunks(path: str, timings: Dict = None) -> Optional[Iterator[Document]]:
+    """Chunks of one file, or None for unsupported types; load/split seconds are added to ``timings``."""
+    documents = _iter_file_documents(path)
+    if documents is None:
+        return None
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=250)
+    return _split_documents(documents, splitter, {} if timings is None else timings)
+
+
+def _load_and_split_file(path: str):
+    """Load and split a single file. Runs inside the process pool, so it must not raise.
+
+    Returns ``(path, chunks, error, timings)``; ``chunks`` is None for unsupported types.
+    """
+    timings = {}
+    try:
+        chunks = _iter_file_chunks(path, timings)
+        return path, (list(chunks) if chunks is not None else None), None, timings
+    except Exception as e:
+        return path, [], f"{type(e).__name__}: {e}", timings
+
+
+def iter_chunks(paths: List[str], workers: int = LOADER_WORKERS, report: Dict = None) -> Iterator[Document]:
+    """Stream the chunks of ``paths`` in path order.
+
+    PDF/DOCX/TXT files are parsed and split by up to ``workers`` processes, with at most
+    ``2 * workers`` files in flight. CSV/Excel files, which can be far larger than memory,
+    are streamed row by row in this process. A file that fails is recorded in
+    ``report['errors']`` and skipped; chunks it yielded before failing were already
+    emitted, so callers should discard them. ``report['sources']`` lists the loaded files,
+    ``report['files_done']`` counts the files processed so far and ``report['timings']``
+    holds per-file ``{'source', 'load', 'split'}`` seconds.
+    """
+    if report is None:
+        report = {}
+    report.setdefault('sources', [])
+    report.setdefault('errors', [])
+    report.setdefault('files_done', 0)
+    report.setdefault('timings', [])
+
+    existing = []
+    for path in paths:
+        if not os.path.exists(path):
+            print(f"Warning: File not found - {path}")
+            continue
+        existing.append(path)
+
+    executor = None
+    if workers > 1 and len(existing) > 1:
+        executor = ProcessPoolExecutor(max_workers=min(workers, len(existing)))
+        print(f"Loading {len(existing)} files with {min(workers, len(existing))} worker processes")
+
+    pending = deque()
+    remaining = iter(existing)
+
+    def fill():
+        while len(pending) < max(1, 2 * workers):
+            path = next(remaining, None)
+            if path is None:
+                return
+            in_pool = executor is not None and not path.lower().endswith(TABULAR_EXTENSIONS)
+            pending.append((path, executor.submit(_load_and_split_file, path) if in_pool else None))
+
+    try:
+        fill()
+        while pending:
+            path, future = pending.popleft()
+            fill()
+            count = 0
+            error = None
+            timings = {}
+            if future is not None:
+                _, file_chunks, error, timings = future.result()
+                if file_chunks is None:
+                    report['files_done'] += 1
+                    continue
+                for chunk in file_chunks or []:
+                    count += 1
+                    yield chunk
+            else:
+                try:
+                    file_chunks = _iter_file_chunks(path, timings)
+                    if file_chunks is None:
+                        report['files_done'] += 1
+                        continue
+                    for chunk in file_chunks:
+                        count += 1
+                        yield chunk
+                except Exception as e:
+                    error = f"{type(e).__name__}: {e}"
+            report['files_done'] += 1
+            report['timings'].append({'source': path, **timings})
+            if error:
+                print(f"Failed to load {path}: {error}")
+                report['errors'].append({'source': path, 'error': error})
+                continue
+            print(f"Loaded: {path} ({count} chunks)")
+            report['sources'].append(path)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+
+SUPPORTED_EXTENSIONS = ('.pdf', '.docx', '.txt', '.csv', '.xls', '.xlsx')
+
+
+def list_document_paths(directory: str) -> List[str]:
+    """Supported files to ingest: SPECIFIC_FILES when no directory is given, else the directory listing."""
+    # Use SPECIFIC_FILES only when no directory was provided
+    if (not directory or directory is None) and SPECIFIC_FILES:
+        files = [SPECIFIC_FILES] if isinstance(SPECIFIC_FILES, str) else SPECIFIC_FILES
+        print(f"Using ONLY files from config: {files}")
+        return list(files)
+
+    paths = []
+    if directory and os.path.exists(directory):
+        files_in_dir = sorted(os.listdir(directory))
+        print(f"Directory '{directory}' contains: {files_in_dir}")
+        for filename in files_in_dir:
+            file_path = os.path.join(directory, filename)
+            if os.path.isfile(file_path) and filename.lower().endswith(SUPPORTED_EXTENSIONS):
+                paths.append(file_path)
+    return paths
+
+
+def file_fingerprint(path: str) -> Dict:
+    """mtime, size and content hash of ``path``."""
+    stat = os.stat(path)
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return {"mtime": stat.st_mtime, "size": stat.st_size, "sha256": digest.hexdigest()}
+
+
+def plan_incremental(paths: List[str], manifest: Dict[str, Dict]) -> Dict:
+    """Compare ``paths`` against a manifest of previously ingested fingerprints.
+
+    Files whose mtime and size are unchanged are skipped without being read; others
+    are hashed, so a touched-but-identical file is still skipped. Returns the files to
+    load, the skipped and deleted files, the changed files whose old chunks must be
+    removed, and the fingerprints for the new manifest.
+    """
+    to_load, skipped, changed = [], [], []
+    fingerprints = {}
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        previous = manifest.get(path)
+        stat = os.stat(path)
+        if previous and previous["mtime"] == stat.st_mtime and previous["size"] == stat.st_size:
+            fingerprints[path] = previous
+            skipped.append(path)
+            continue
+        current = file_fingerprint(path)
+        fingerprints[path] = current
+        if previous and previous["sha256"] == current["sha256"]:
+            skipped.append(path)
+            continue
+        if previous:
+            changed.append(path)
+        to_load.append(path)
+
+    deleted = [path for path in manifest if path not in fingerprints]
+    return {
+        "to_load": to_load,
+        "skipped": skipped,
+        "changed": changed,
+        "deleted": deleted,
+        "fingerprints": fingerprints,
+    }
@@ -1,8 +1,21 @@
-from typing import List
+from typing import Dict, List
+import json
 import os
+import threading
+import numpy as np
+from .config import HASHING_FEATURES
+
+
+def _hashing_vectorizer(n_features: int = HASHING_FEATURES, ngram_range=(1, 2)):
+    from sklearn.feature_extraction.text import HashingVectorizer
+    # Stateless: nothing to fit, so ingestion batches and queries share one feature space
+    return HashingVectorizer(n_features=n_features, ngram_range=tuple(ngram_range),
+                             alternate_sign=False, norm="l2", dtype=np.float32)
 
 
 class EmbeddingManager:
+    VECTORIZER_FILE = "vectorizer.json"
+
     def __init__(self):
         print("Initializing embeddings...")
 
@@ -17,34 +30,71 @@ class EmbeddingManager:
                 print(f"Loading model from local cache: {local_model_path}")
                 self.model = SentenceTransformer(local_model_path, device='cpu')
                 print("Using sentence-transformers for semantic search")
-                self._is_tfidf = False
+                self._is_hashed = False
             else:
                 # Local cache incomplete, raise exception to trigger fallback
                 raise Exception("Local model cache incomplete, using fallback")
 
         except Exception as e:
             print(f"Failed to load sentence-transformers: {e}")
-            print("Using fallback TF-IDF embeddings (no download required)...")
-            from sklearn.feature_extraction.text import TfidfVectorizer
-            self.model = TfidfVectorizer(max_features=384, ngram_range=(1, 2))
-            self._is_tfidf = True
-            self._fitted = False
-            self._all_texts = []
+            print("Using fallback hashed n-gram embeddings (no download required)...")
+            self.model = _hashing_vectorizer()
+            self._is_hashed = True
             return
-        self._is_tfidf = False
-
-    def embed_texts(self, texts: List[str]) -> List[List[float]]:
-        if self._is_tfidf:
-            import numpy as np
-            self._all_texts.extend(texts)
-            if not self._fitted:
-                self.model.fit(self._all_texts)
-                self._fitted = True
-            vectors = self.model.transform(texts).toarray()
-            if vectors.shape[1] < 384:
-                vectors = np.pad(vectors, ((0, 0), (0, 384 - vectors.shape[1])))
-            elif vectors.shape[1] > 384:
-                vectors = vectors[:, :384]
-            return vectors.tolist()
-        return self.model.encode(texts, convert_to_numpy=True).tolist()
+        self._is_hashed = False
+
+    @property
+    def is_sparse(self) -> bool:
+        """True when ``embed`` returns scipy CSR rows (hashed n-gram fallback) instead of a dense array."""
+        return self._is_hashed
+
+    def embed(self, texts: List[str], batch_size: int = 32):
+        """Embed ``texts`` into a 2-D float32 array, ``batch_size`` texts per forward pass.
+
+        In fallback mode the result is a sparse CSR matrix of hashed, L2-normalized n-gram counts.
+        """
+        if self._is_hashed:
+            return self.model.transform(texts)
+        return self.model.encode(texts, batch_size=batch_size, convert_to_numpy=True).astype(np.float32, copy=False)
+
+    def _vectorizer_params(self) -> Dict:
+        return {'n_features': int(self.model.n_features), 'ngram_range': list(self.model.ngram_range)}
+
+    def save(self, path: str):
+        """Write the fallback vectorizer's parameters into index directory ``path`` so queries hash identically on reload."""
+        if self._is_hashed:
+            with open(os.path.join(path, self.VECTORIZER_FILE), "w", encoding="utf-8") as f:
+                json.dump(self._vectorizer_params(), f)
+
+    def load(self, path: str):
+        """Rebuild the vectorizer described by ``save``; an index without one must use the dense model."""
+        vectorizer_path = os.path.join(path, self.VECTORIZER_FILE)
+        if os.path.exists(vectorizer_path) != self._is_hashed:
+            raise ValueError(f"Index at {path} was built with different embeddings; re-ingest with incremental=False")
+        if self._is_hashed:
+            with open(vectorizer_path, encoding="utf-8") as f:
+                params = json.load(f)
+            try:
+                n_features = int(params['n_features'])
+                ngram_range = tuple(int(n) for n in params['ngram_range'])
+            except (KeyError, TypeError, ValueError):
+                raise ValueError(f"Invalid vectorizer parameters in {vectorizer_path}")
+            if len(ngram_range) != 2:
+                raise ValueError(f"Invalid vectorizer parameters in {vectorizer_path}")
+            if (n_features, ngram_range) != (self.model.n_features, tuple(self.model.ngram_range)):
+                self.model = _hashing_vectorizer(n_features, ngram_range)
+
+
+
+_shared_manager = None
+_shared_lock = threading.Lock()
+
 
+def get_embedding_manager() -> EmbeddingManager:
+    """Process-wide ``EmbeddingManager``: the model is loaded once and shared by every pipeline and thread."""
+    global _shared_manager
+    if _shared_manager is None:
+        with _shared_lock:
+            if _shared_manager is None:
+                _shared_manager = EmbeddingManager()
+    return _shared_manager
@@ -0,0 +1,168 @@
+import json
+import re
+import numpy as np
+from typing import Dict, List, Sequence, Tuple
+from .array_files import load_arrays, save_arrays
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+class BM25Index:
+    """Okapi BM25 over chunk texts, stored as compressed-sparse-row posting arrays.
+
+    Postings for term ``t`` are ``doc_ids[indptr[t]:indptr[t + 1]]`` with their
+    precomputed BM25 term weights in ``weights``, so a query gathers a few array
+    slices, multiplies by idf and sums per document. Document ids are the row
+    numbers of the companion ``VectorStore``. New documents are buffered and merged
+    into the arrays on the next query.
+
+    Once the index holds ``_MAX_DF_MIN_DOCS`` documents, terms that occur in more than
+    ``max_df`` of them are skipped at query time: their idf is close to zero but their
+    posting lists are the longest. They are still used when a query has no other terms.
+    """
+
+    _DENSE_ACCUMULATE_RATIO = 32
+    _MAX_DF_MIN_DOCS = 1000
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, max_df: float = 0.5):
+        self.k1 = k1
+        self.b = b
+        self.max_df = max_df
+        self.vocab: Dict[str, int] = {}
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.doc_ids = np.empty(0, dtype=np.int32)
+        self.tfs = np.empty(0, dtype=np.float32)
+        self.doc_lengths = np.empty(0, dtype=np.float32)
+        self.weights = np.empty(0, dtype=np.float32)
+        self.idf = np.empty(0, dtype=np.float32)
+        self._pending: List[Tuple[np.ndarray, np.ndarray]] = []
+
+    def __len__(self) -> int:
+        return self.doc_lengths.shape[0] + len(self._pending)
+
+    def add(self, texts: Sequence[str]):
+        """Index ``texts`` as the next document ids, in order."""
+        for text in texts:
+            term_ids = [self.vocab.setdefault(token, len(self.vocab)) for token in tokenize(text)]
+            terms, counts = np.unique(np.asarray(term_ids, dtype=np.int64), return_counts=True)
+            self._pending.append((terms, counts))
+
+    def _flush(self):
+        if not self._pending:
+            return
+        first_doc = self.doc_lengths.shape[0]
+        lengths = np.array([counts.sum() for _, counts in self._pending], dtype=np.float32)
+        new_terms = np.concatenate([terms for terms, _ in self._pending])
+        new_tfs = np.concatenate([counts for _, counts in self._pending]).astype(np.float32)
+        new_docs = np.repeat(np.arange(first_doc, first_doc + len(self._pending), dtype=np.int32),
+                             [terms.shape[0] for terms, _ in self._pending])
+        self._pending = []
+
+        # Merge old and new postings; a stable sort by term keeps doc ids ascending per term
+        old_terms = np.repeat(np.arange(self.indptr.shape[0] - 1), np.diff(self.indptr))
+        terms = np.concatenate([old_terms, new_terms])
+        order = np.argsort(terms, kind="stable")
+        self.doc_ids = np.concatenate([self.doc_ids, new_docs])[order]
+        self.tfs = np.concatenate([self.tfs, new_tfs])[order]
+        self.doc_lengths = np.concatenate([self.doc_lengths, lengths])
+        self._rebuild(terms[order])
+
+    def _rebuild(self, sorted_terms: np.ndarray):
+        """Recompute ``indptr``, idf and the per-posting weights (which depend on the average doc length)."""
+        n_terms = len(self.vocab)
+        self.indptr = np.zeros(n_terms + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sorted_terms, minlength=n_terms), out=self.indptr[1:])
+        n_docs = self.doc_lengths.shape[0]
+        df = np.diff(self.indptr).astype(np.float32)
+        self.idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+        avgdl = float(self.doc_lengths.mean()) if n_docs else 1.0
+        norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[self.doc_ids] / max(avgdl, 1e-9))
+        self.weights = (self.tfs * (self.k1 + 1) / (self.tfs + norm)).astype(np.float32)
+
+    def keep(self, mask: np.ndarray):
+        """Remove the postings of documents whose ``mask`` entry is False and renumber the rest to match the store."""
+        self._flush()
+        mask = np.asarray(mask, dtype=bool)
+        new_ids = np.cumsum(mask, dtype=np.int64) - 1
+        kept = mask[self.doc_ids]
+        terms = np.repeat(np.arange(self.indptr.shape[0] - 1), np.diff(self.indptr))[kept]
+        self.doc_ids = new_ids[self.doc_ids[kept]].astype(np.int32)
+        self.tfs = self.tfs[kept]
+        self.doc_lengths = self.doc_lengths[mask]
+        self._rebuild(terms)
+
+    def search(self, text: str, top_k: int = 5, rows: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Document ids and BM25 scores of the ``top_k`` best matches, best first.
+
+        ``rows`` restricts the result to those document ids.
+        """
+        self._flush()
+        n_docs = self.doc_lengths.shape[0]
+        terms = {self.vocab[token] for token in tokenize(text) if token in self.vocab}
+        slices = [(self.indptr[t], self.indptr[t + 1], self.idf[t]) for t in terms
+                  if self.indptr[t + 1] > self.indptr[t]]
+        if n_docs >= self._MAX_DF_MIN_DOCS:
+            max_postings = self.max_df * n_docs
+            selective = [item for item in slices if item[1] - item[0] <= max_postings]
+            slices = selective or slices
+        if not slices or top_k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        ids = np.concatenate([self.doc_ids[start:end] for start, end, _ in slices])
+        contributions = np.concatenate([self.weights[start:end] * idf for start, end, idf in slices])
+        if rows is not None:
+            allowed = np.zeros(n_docs, dtype=bool)
+            allowed[rows] = True
+            keep = allowed[ids]
+            ids, contributions = ids[keep], contributions[keep]
+            if not ids.shape[0]:
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        if ids.shape[0] * self._DENSE_ACCUMULATE_RATIO > n_docs:
+            # Long posting lists: a dense per-document accumulator beats sorting the ids
+            dense = np.bincount(ids, weights=contributions, minlength=n_docs)
+            docs = np.flatnonzero(dense)
+            scores = dense[docs].astype(np.float32)
+        else:
+            docs, inverse = np.unique(ids, return_inverse=True)
+            scores = np.bincount(inverse, weights=contributions).astype(np.float32)
+        if top_k < docs.shape[0]:
+            best = np.argpartition(scores, -top_k)[-top_k:]
+        else:
+            best = np.arange(docs.shape[0])
+        best = best[np.argsort(scores[best])[::-1]]
+        return docs[best].astype(np.int64), scores[best]
+
+    def save(self, path: str):
+        self._flush()
+        save_arrays(path, indptr=self.indptr, doc_ids=self.doc_ids, tfs=self.tfs, doc_lengths=self.doc_lengths,
+                    weights=self.weights, idf=self.idf,
+                    params=np.array([self.k1, self.b, self.max_df]),
+                    vocab=np.frombuffer(json.dumps(list(self.vocab)).encode("utf-8"), dtype=np.uint8))
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "BM25Index":
+        """Load an index written by ``save``; with ``mmap`` the posting arrays stay memory-mapped."""
+        data = load_arrays(path, mmap)
+        k1, b, max_df = (float(v) for v in data["params"])
+        index = cls(k1=k1, b=b, max_df=max_df)
+        index.vocab = {term: i for i, term in enumerate(json.loads(data["vocab"].tobytes().decode("utf-8")))}
+        index.indptr = data["indptr"]
+        index.doc_ids = data["doc_ids"]
+        index.tfs = data["tfs"]
+        index.doc_lengths = data["doc_lengths"]
+        index.weights = data["weights"]
+        index.idf = data["idf"]
+        return index
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], k: int = 60) -> Dict[int, float]:
+    """Fuse ranked id lists: each id scores ``sum(1 / (k + rank))`` over the lists it appears in."""
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            fused[int(doc_id)] = fused.get(int(doc_id), 0.0) + 1.0 / (k + rank + 1)
+    return fused
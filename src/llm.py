@@ -1,62 +1,219 @@
-from openai import OpenAI
-import os
-from .config import DATABRICKS_TOKEN, DATABRICKS_HOST, DATABRICKS_MODEL_ENDPOINT
+import asyncio
+import random
+import threading
+import time
+import weakref
+from typing import AsyncIterator, Iterator
+
+from .config import (
+    DATABRICKS_TOKEN, DATABRICKS_HOST, DATABRICKS_MODEL_ENDPOINT, LLM_MODEL, LLM_BASE_URL,
+    LLM_TIMEOUT, LLM_MAX_RETRIES, LLM_MAX_CONCURRENCY, LLM_MAX_CONNECTIONS,
+)
 
 
 # Construct the proper serving endpoint URL
-if DATABRICKS_HOST and DATABRICKS_MODEL_ENDPOINT:
+if LLM_BASE_URL:
+    base_url = LLM_BASE_URL
+elif DATABRICKS_HOST and DATABRICKS_MODEL_ENDPOINT:
     base_url = f"{DATABRICKS_HOST.rstrip('/')}/serving-endpoints"
 else:
     base_url = "https://adb-5732085104630262.2.azuredatabricks.net/serving-endpoints"
 
+SYSTEM_PROMPT = "You are an expert information extraction assistant. Extract and provide answers from the given context. Never refuse to answer if the information exists in the context, regardless of how the question is phrased. Only say you don't know when the information is genuinely absent."
 
-client = OpenAI(
-    api_key=DATABRICKS_TOKEN,
-    base_url=base_url
-)
+# openai/httpx are imported and the pooled client is built on first use, not at import time
+_client = None
+_client_lock = threading.Lock()
 
 
-def generate_answer(prompt: str) -> str:
-    try:
-        response = client.chat.completions.create(
-            model="databricks-meta-llama-3-1-8b-instruct",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are an expert information extraction assistant. Extract and provide answers from the given context. Never refuse to answer if the information exists in the context, regardless of how the question is phrased. Only say you don't know when the information is genuinely absent."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            max_tokens=1024,
-            temperature=0.1
+def _limits():
+    import httpx
+    return httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_CONNECTIONS)
+
+
+def get_client():
+    """Shared, lazily created sync ``OpenAI`` client with a pooled HTTP connection."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                import httpx
+                from openai import OpenAI
+                # Retries are handled here (with jitter and Retry-After) rather than by the SDK
+                _client = OpenAI(
+                    api_key=DATABRICKS_TOKEN,
+                    base_url=base_url,
+                    timeout=LLM_TIMEOUT,
+                    max_retries=0,
+                    http_client=httpx.Client(limits=_limits(), timeout=LLM_TIMEOUT),
+                )
+    return _client
+
+# httpx async clients are bound to the event loop they were first used on, so keep
+# one pooled client and concurrency semaphore per running loop
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, tuple]" = weakref.WeakKeyDictionary()
+
+
+def get_async_client():
+    """Shared ``(AsyncOpenAI, Semaphore)`` for the running event loop."""
+    loop = asyncio.get_running_loop()
+    entry = _async_clients.get(loop)
+    if entry is None:
+        import httpx
+        from openai import AsyncOpenAI
+        async_client = AsyncOpenAI(
+            api_key=DATABRICKS_TOKEN,
+            base_url=base_url,
+            timeout=LLM_TIMEOUT,
+            max_retries=0,
+            http_client=httpx.AsyncClient(limits=_limits(), timeout=LLM_TIMEOUT),
         )
-        return response.choices[0].message.content
-    except Exception as e:
-        error_msg = str(e)
+        entry = (async_client, asyncio.Semaphore(LLM_MAX_CONCURRENCY))
+        _async_clients[loop] = entry
+    return entry
+
+
+async def close_async_client():
+    """Close the running loop's pooled client, if one was created; call before the loop ends."""
+    entry = _async_clients.pop(asyncio.get_running_loop(), None)
+    if entry is not None:
+        await entry[0].close()
+
+
+def _messages(prompt: str):
+    return [
+        {
+            "role": "system",
+            "content": SYSTEM_PROMPT
+        },
+        {
+            "role": "user",
+            "content": prompt
+        }
+    ]
+
+
+def _completion_kwargs(prompt: str, stream: bool = False):
+    return dict(model=LLM_MODEL, messages=_messages(prompt), max_tokens=1024, temperature=0.1, stream=stream)
+
+
+def _is_retryable(error: Exception) -> bool:
+    import openai
+    if isinstance(error, openai.APIConnectionError):  # includes timeouts
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+
+def _is_auth_error(error: Exception) -> bool:
+    import openai
+    if isinstance(error, (openai.AuthenticationError, openai.PermissionDeniedError)):
+        return True
+    # the client refuses to be built without an API key
+    return isinstance(error, openai.OpenAIError) and not isinstance(error, openai.APIError)
+
+
+def _backoff_delay(attempt: int, error: Exception) -> float:
+    """Full-jitter exponential backoff, honouring a numeric Retry-After header when present."""
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), 30.0)
+        except ValueError:
+            pass
+    return random.uniform(0, min(8.0, 0.5 * 2 ** attempt))
+
+
+def _error_answer(prompt: str, error: Exception) -> str:
+    # If the Databricks token is missing or invalid, use fallback mode
+    if _is_auth_error(error):
+        print("\n Databricks token missing or invalid. Using fallback mode (context only).\n")
+        return generate_fallback_answer(prompt)
+    return f"Error generating answer: {error}"
+
+
+def generate_answer(prompt: str) -> str:
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        try:
+            response = get_client().chat.completions.create(**_completion_kwargs(prompt))
+            return response.choices[0].message.content
+        except Exception as e:
+            if attempt < LLM_MAX_RETRIES and _is_retryable(e):
+                time.sleep(_backoff_delay(attempt, e))
+                continue
+            return _error_answer(prompt, e)
+
+
+def stream_answer(prompt: str) -> Iterator[str]:
+    """Yield answer tokens as they arrive. Retries happen only before the first token."""
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        started = False
+        try:
+            with get_client().chat.completions.create(**_completion_kwargs(prompt, stream=True)) as stream:
+                for event in stream:
+                    if event.choices and event.choices[0].delta.content:
+                        started = True
+                        yield event.choices[0].delta.content
+            return
+        except Exception as e:
+            if not started and attempt < LLM_MAX_RETRIES and _is_retryable(e):
+                time.sleep(_backoff_delay(attempt, e))
+                continue
+            yield _error_answer(prompt, e) if not started else f"\n\n[stream interrupted: {e}]"
+            return
+
+
+async def agenerate_answer(prompt: str) -> str:
+    """Async ``generate_answer``: pooled connections, at most LLM_MAX_CONCURRENCY requests in flight."""
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        try:
+            async_client, semaphore = get_async_client()
+            async with semaphore:
+                response = await async_client.chat.completions.create(**_completion_kwargs(prompt))
+            return response.choices[0].message.content
+        except Exception as e:
+            if attempt < LLM_MAX_RETRIES and _is_retryable(e):
+                await asyncio.sleep(_backoff_delay(attempt, e))
+                continue
+            return _error_answer(prompt, e)
 
-        # If Databricks token is invalid, use fallback mode
-        if "403" in error_msg or "Invalid access token" in error_msg:
-            print("\n Databricks token invalid. Using fallback mode (context only).\n")
-            return generate_fallback_answer(prompt)
 
-        return f"Error generating answer: {error_msg}"
+async def astream_answer(prompt: str) -> AsyncIterator[str]:
+    """Async ``stream_answer``; the concurrency slot is held until the stream finishes."""
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        started = False
+        try:
+            async_client, semaphore = get_async_client()
+            async with semaphore:
+                stream = await async_client.chat.completions.create(**_completion_kwargs(prompt, stream=True))
+                async with stream:
+                    async for event in stream:
+                        if event.choices and event.choices[0].delta.content:
+                            started = True
+                            yield event.choices[0].delta.content
+            return
+        except Exception as e:
+            if not started and attempt < LLM_MAX_RETRIES and _is_retryable(e):
+                await asyncio.sleep(_backoff_delay(attempt, e))
+                continue
+            yield _error_answer(prompt, e) if not started else f"\n\n[stream interrupted: {e}]"
+            return
 
 
 def generate_fallback_answer(prompt: str) -> str:
     """Simple fallback when Databricks is unavailable - extracts context from prompt"""
-    # Extract the context section from the prompt
-    if "CONTEXT:" in prompt and "QUESTION:" in prompt:
-        context_start = prompt.find("CONTEXT:") + len("CONTEXT:")
-        question_start = prompt.find("QUESTION:")
+    # Extract the context section from the prompt (RAGPipeline labels it "CONTEXT FROM DOCUMENTS:")
+    marker = next((m for m in ("CONTEXT FROM DOCUMENTS:", "CONTEXT:") if m in prompt), None)
+    question_start = prompt.rfind("QUESTION:")
+    if marker and question_start > prompt.find(marker):
+        context_start = prompt.find(marker) + len(marker)
         context = prompt[context_start:question_start].strip()
-        question = prompt[question_start + len("QUESTION:"):].replace("ANSWER:", "").strip()
 
         # Return the full context with key information highlighted
         lines = context.split('\n')
         relevant_lines = [line for line in lines if line.strip()][:10]  # First 10 non-empty lines
         return "Based on the documents:\n\n" + "\n".join(relevant_lines)
 
-    return "Unable to generate answer. Please check your Databricks credentials."
\ No newline at end of file
+    return "Unable to generate answer. Please check your Databricks credentials."
@@ -0,0 +1,177 @@
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Tuple
+import numpy as np
+
+
+class Histogram:
+    """Count and sum of all observations plus a sliding window of the latest ones for percentiles."""
+
+    def __init__(self, window: int = 4096):
+        self.count = 0
+        self.sum = 0.0
+        self.samples = deque(maxlen=window)
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        self.samples.append(value)
+
+    def percentiles(self, qs=(50, 95, 99)) -> Dict[str, float]:
+        if not self.samples:
+            return {f"p{q}": 0.0 for q in qs}
+        values = np.percentile(np.fromiter(self.samples, dtype=np.float64), qs)
+        return {f"p{q}": float(v) for q, v in zip(qs, values)}
+
+
+def _label_key(labels: Dict) -> Tuple:
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(labels: Tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+class Metrics:
+    """Thread-safe registry of stage timers (latency histograms) and counters.
+
+    ``timer("embed")`` records wall time per stage; ``inc("chunks", n)`` counts things,
+    optionally split by labels (``inc("cache_hits", cache="answers")``). Read it back
+    with ``snapshot()`` or as Prometheus text with ``prometheus()``.
+    """
+
+    QUANTILES = (50, 95, 99)
+
+    def __init__(self, prefix: str = "rag"):
+        self.prefix = prefix
+        self._timers: Dict[str, Histogram] = {}
+        self._counters: Dict[Tuple[str, Tuple], float] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float):
+        with self._lock:
+            histogram = self._timers.get(stage)
+            if histogram is None:
+                histogram = self._timers[stage] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def counter(self, name: str, **labels) -> float:
+        return self._counters.get((name, _label_key(labels)), 0)
+
+    def reset(self):
+        with self._lock:
+            self._timers.clear()
+            self._counters.clear()
+
+    def cache_hit_rates(self) -> Dict[str, float]:
+        """Hit rate per ``cache`` label, from the ``cache_hits``/``cache_misses`` counters."""
+        rates = {}
+        with self._lock:
+            caches = {dict(labels).get("cache") for name, labels in self._counters if name == "cache_hits"
+                      or name == "cache_misses"}
+        for cache in sorted(c for c in caches if c):
+            hits = self.counter("cache_hits", cache=cache)
+            lookups = hits + self.counter("cache_misses", cache=cache)
+            rates[cache] = hits / lookups if lookups else 0.0
+        return rates
+
+    def snapshot(self) -> Dict:
+        """Plain-dict view: per-stage count/sum/mean/p50/p95/p99 seconds, counters and cache hit rates."""
+        with self._lock:
+            timers = {}
+            for stage, histogram in sorted(self._timers.items()):
+                timers[stage] = {'count': histogram.count, 'sum': histogram.sum,
+                                 'mean': histogram.sum / histogram.count if histogram.count else 0.0,
+                                 **histogram.percentiles(self.QUANTILES)}
+            counters = {name + _format_labels(labels): value
+                        for (name, labels), value in sorted(self._counters.items())}
+        return {'timers': timers, 'counters': counters, 'cache_hit_rates': self.cache_hit_rates()}
+
+    def prometheus(self) -> str:
+        """Render in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            if self._timers:
+                family = f"{self.prefix}_stage_seconds"
+                lines.append(f"# HELP {family} Wall time per pipeline stage.")
+                lines.append(f"# TYPE {family} summary")
+                for stage, histogram in sorted(self._timers.items()):
+                    for name, value in histogram.percentiles(self.QUANTILES).items():
+                        quantile = int(name[1:]) / 100
+                        lines.append(f'{family}{{stage="{stage}",quantile="{quantile}"}} {value:.6f}')
+                    lines.append(f'{family}_sum{{stage="{stage}"}} {histogram.sum:.6f}')
+                    lines.append(f'{family}_count{{stage="{stage}"}} {histogram.count}')
+            typed = set()
+            for (name, labels), value in sorted(self._counters.items()):
+                family = f"{self.prefix}_{name}_total"
+                if family not in typed:
+                    lines.append(f"# TYPE {family} counter")
+                    typed.add(family)
+                lines.append(f"{family}{_format_labels(labels)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str):
+        """Write ``prometheus()`` to ``path`` atomically (e.g. for the node-exporter textfile collector)."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus())
+        os.replace(tmp_path, path)
+
+    def serve(self, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """Serve ``/metrics`` on a daemon thread; call ``shutdown()`` on the returned server to stop it."""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f"Serving metrics on http://{host}:{server.server_address[1]}/metrics")
+        return server
+
+
+# Process-wide registry used by the pipeline
+metrics = Metrics()
+
+
+def profile_call(fn: Callable, *args, sort: str = "cumulative", limit: int = 30, **kwargs):
+    """Run ``fn`` under cProfile; returns ``(result, report)`` with the top ``limit`` functions by ``sort``."""
+    profiler = cProfile.Profile()
+    result = profiler.runcall(fn, *args, **kwargs)
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats(sort).print_stats(limit)
+    return result, out.getvalue()
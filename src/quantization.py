@@ -0,0 +1,223 @@
+import numpy as np
+from typing import Dict, Type
+from .array_files import load_arrays, save_arrays
+
+
+class Codec:
+    """Compressed copy of a ``VectorStore``'s normalized rows, scored approximately.
+
+    Codecs mirror the store like ``IVFIndex`` does: ``add`` encodes appended rows,
+    ``keep`` follows row compaction, and ``scores`` returns approximate dot products
+    of a normalized query with all rows (or the row ids in ``rows``).
+    """
+
+    mode = None
+    _SCORE_BLOCK = 1024  # rows decoded to float32 at a time; small blocks stay in cache
+
+    def __init__(self):
+        self.codes = None
+        self.trained_rows = 0
+
+    def __len__(self) -> int:
+        return 0 if self.codes is None else self.codes.shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.codes.nbytes) if self.codes is not None else 0
+
+    def train(self, vectors: np.ndarray):
+        self.trained_rows = vectors.shape[0]
+        self.codes = None
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def add(self, vectors: np.ndarray):
+        if not self.trained_rows:
+            # quantized while the store was empty: fit on the first rows, refit once it grows 4x
+            self.train(vectors)
+        encoded = np.concatenate([self.encode(np.asarray(vectors[start:start + self._SCORE_BLOCK], dtype=np.float32))
+                                  for start in range(0, vectors.shape[0], self._SCORE_BLOCK)])
+        self.codes = encoded if self.codes is None else np.concatenate([self.codes, encoded])
+
+    def keep(self, mask: np.ndarray):
+        """Discard the codes of rows the store removed; ``mask`` is True for rows that remain."""
+        self.codes = self.codes[mask]
+
+    def needs_retrain(self) -> bool:
+        """Whether the scales or codebooks should be refitted: over 4x their training rows are now encoded."""
+        return len(self) > 4 * max(self.trained_rows, 1)
+
+    def _block_scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def scores(self, query: np.ndarray, rows: np.ndarray = None) -> np.ndarray:
+        codes = self.codes if rows is None else self.codes[rows]
+        out = np.empty(codes.shape[0], dtype=np.float32)
+        prepared = self._prepare(query)
+        for start in range(0, codes.shape[0], self._SCORE_BLOCK):
+            out[start:start + self._SCORE_BLOCK] = self._block_scores(codes[start:start + self._SCORE_BLOCK], prepared)
+        return out
+
+    def _prepare(self, query: np.ndarray):
+        return np.asarray(query, dtype=np.float32)
+
+    def _state(self) -> Dict[str, np.ndarray]:
+        return {}
+
+    def _set_state(self, data):
+        pass
+
+    def save(self, path: str):
+        save_arrays(path, mode=np.array(self.mode), codes=self.codes, trained_rows=np.array(self.trained_rows),
+                    **self._state())
+
+
+class Float16Codec(Codec):
+    """Half-precision rows: 2x smaller than float32, recall is practically unchanged."""
+
+    mode = "float16"
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return vectors.astype(np.float16)
+
+    def _block_scores(self, codes, query):
+        return codes.astype(np.float32) @ query
+
+
+class Int8Codec(Codec):
+    """Scalar quantization to one byte per dimension with a per-dimension offset and scale.
+
+    ``x[d] ~= offset[d] + scale[d] * code[d]`` with ``offset``/``scale`` spanning each
+    dimension's range in the training rows (values outside it are clipped), so a score
+    is ``q . offset + (q * scale) . code``.
+    """
+
+    mode = "int8"
+
+    def __init__(self):
+        super().__init__()
+        self.offset = None
+        self.scale = None
+
+    def train(self, vectors: np.ndarray):
+        super().train(vectors)
+        low = np.asarray(vectors.min(axis=0), dtype=np.float32)
+        high = np.asarray(vectors.max(axis=0), dtype=np.float32)
+        self.offset = low
+        self.scale = np.maximum(high - low, 1e-12) / 255.0
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return np.clip(np.rint((vectors - self.offset) / self.scale), 0, 255).astype(np.uint8)
+
+    def _prepare(self, query):
+        query = np.asarray(query, dtype=np.float32)
+        return float(query @ self.offset), query * self.scale
+
+    def _block_scores(self, codes, prepared):
+        bias, scaled_query = prepared
+        return codes.astype(np.float32) @ scaled_query + bias
+
+    def _state(self):
+        return {'offset': self.offset, 'scale': self.scale}
+
+    def _set_state(self, data):
+        self.offset = data['offset']
+        self.scale = data['scale']
+
+
+class PQCodec(Codec):
+    """Product quantization: ``m`` sub-vectors, each replaced by the id of one of 256 centroids.
+
+    Rows cost ``m`` bytes. Scoring uses asymmetric distance computation: the query stays
+    in float32, its dot product with every centroid is tabulated once per query, and a
+    row's score is the sum of ``m`` table lookups.
+    """
+
+    mode = "pq"
+    _SCORE_BLOCK = 16384
+    _CENTROIDS = 256
+    _TRAIN_POINTS_PER_CENTROID = 40
+
+    def __init__(self, m: int = 48, iterations: int = 10, seed: int = 0):
+        super().__init__()
+        self.m = m
+        self.iterations = iterations
+        self.seed = seed
+        self.centroids = None  # (m, 256, dim / m)
+
+    def _split(self, vectors: np.ndarray) -> np.ndarray:
+        if vectors.shape[1] % self.m:
+            raise ValueError(f"PQ needs the dimension ({vectors.shape[1]}) to be a multiple of m ({self.m})")
+        return vectors.reshape(vectors.shape[0], self.m, vectors.shape[1] // self.m)
+
+    @staticmethod
+    def _nearest(points: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        # argmin ||p - c||^2 == argmax (p . c - ||c||^2 / 2)
+        return np.argmax(points @ centroids.T - 0.5 * (centroids * centroids).sum(axis=1), axis=1)
+
+    def train(self, vectors: np.ndarray):
+        super().train(vectors)
+        rng = np.random.default_rng(self.seed)
+        n = vectors.shape[0]
+        k = min(self._CENTROIDS, n)
+        sample = np.sort(rng.choice(n, min(n, k * self._TRAIN_POINTS_PER_CENTROID), replace=False))
+        parts = self._split(np.asarray(vectors[sample], dtype=np.float32))
+        self.centroids = np.zeros((self.m, self._CENTROIDS, parts.shape[2]), dtype=np.float32)
+        for j in range(self.m):
+            points = parts[:, j]
+            centroids = points[rng.choice(points.shape[0], k, replace=False)].copy()
+            for _ in range(self.iterations):
+                labels = self._nearest(points, centroids)
+                counts = np.bincount(labels, minlength=k)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, labels, points)
+                filled = counts > 0
+                centroids[filled] = sums[filled] / counts[filled, None]
+            self.centroids[j, :k] = centroids
+            self.centroids[j, k:] = centroids[0]  # padding for tiny stores; argmax ties pick id 0
+        self.codes = None
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        parts = self._split(vectors)
+        codes = np.empty((vectors.shape[0], self.m), dtype=np.uint8)
+        for j in range(self.m):
+            codes[:, j] = self._nearest(parts[:, j], self.centroids[j])
+        return codes
+
+    def _prepare(self, query):
+        query = np.asarray(query, dtype=np.float32).reshape(self.m, -1)
+        # lookup table (m, 256): dot product of each query sub-vector with each centroid
+        return np.einsum("msd,md->ms", self.centroids, query)
+
+    def _block_scores(self, codes, table):
+        scores = np.zeros(codes.shape[0], dtype=np.float32)
+        for j in range(self.m):
+            scores += table[j][codes[:, j]]
+        return scores
+
+    def _state(self):
+        return {'centroids': self.centroids, 'params': np.array([self.m, self.iterations, self.seed])}
+
+    def _set_state(self, data):
+        self.m, self.iterations, self.seed = (int(v) for v in data['params'])
+        self.centroids = data['centroids']
+
+
+CODECS: Dict[str, Type[Codec]] = {codec.mode: codec for codec in (Float16Codec, Int8Codec, PQCodec)}
+
+
+def make_codec(mode: str, **kwargs) -> Codec:
+    if mode not in CODECS:
+        raise ValueError(f"Unknown quantization mode: {mode} (expected one of {', '.join(CODECS)})")
+    return CODECS[mode](**kwargs)
+
+
+def load_codec(path: str, mmap: bool = True) -> Codec:
+    """Load codes written by ``Codec.save``; with ``mmap`` they stay memory-mapped."""
+    data = load_arrays(path, mmap)
+    codec = make_codec(str(data['mode']))
+    codec._set_state(data)
+    codec.codes = data['codes']
+    codec.trained_rows = int(data['trained_rows'])
+    return codec
@@ -1,64 +1,303 @@
-from typing import Dict
-from .document_loader import load_documents_from_directory
-from langchain.schema import Document
-from .embeddings import EmbeddingManager
-from .vector_store import VectorStore
-from .llm import generate_answer
-from .config import DOCS_PATH, TOP_K
+import time
+_IMPORT_STARTED = time.perf_counter()
+
+import asyncio
+import json
+import os
+from typing import Callable, Dict, List
+from .document_loader import iter_chunks, list_document_paths, plan_incremental
+from .embeddings import EmbeddingManager, get_embedding_manager
+from .vector_store import SparseVectorStore, VectorStore, atomic_directory
+from .llm import agenerate_answer, close_async_client, generate_answer, get_client, stream_answer
+from .cache import LRUCache
+from .context_builder import ContextBuilder, count_tokens
+from .metrics import metrics
+from .config import (
+    DOCS_PATH, TOP_K, MIN_SCORE_THRESHOLD, EMBED_BATCH_SIZE, INDEX_PATH, ANN_MIN_ROWS, ANN_NLIST, ANN_NPROBE,
+    QUERY_CACHE_SIZE, QUERY_CACHE_TTL, ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL, LLM_MODEL, LLM_MAX_CONCURRENCY,
+    RETRIEVAL_MODE, METRICS_FILE, VECTOR_QUANTIZATION, PQ_SUBVECTORS, QUANT_RERANK,
+)
+
+# Wall time spent importing this module and its dependencies (heavy libraries load lazily)
+IMPORT_SECONDS = time.perf_counter() - _IMPORT_STARTED
+
+
+NO_ANSWER = "No relevant information found in the uploaded documents."
 
 
 class RAGPipeline:
-    def __init__(self):
-        self.embedding_manager = EmbeddingManager()
-        self.vector_store = VectorStore()
+    MANIFEST_FILE = "manifest.json"
+
+    def __init__(self, embedding_manager: EmbeddingManager = None):
+        started = time.perf_counter()
+        # Shared across pipelines (e.g. Streamlit sessions) so the model is loaded once per process
+        self.embedding_manager = embedding_manager or get_embedding_manager()
+        self.vector_store = self._new_store()
         self.loaded_files = []  # Track loaded file names
+        self.manifest = {}  # source path -> fingerprint of the ingested version
+        self.query_cache = LRUCache(QUERY_CACHE_SIZE, QUERY_CACHE_TTL)  # normalized question -> vector
+        self.answer_cache = LRUCache(ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL)  # (question, chunk ids, model) -> answer
+        self._answer_cache_version = None
+        self.retrieval_mode = self._resolve_retrieval_mode(RETRIEVAL_MODE)
+        self.context_builder = ContextBuilder()
+        # Cold-start timings in seconds; first_query is measured from the start of this module's import
+        self.startup = {'import': IMPORT_SECONDS, 'init': time.perf_counter() - started,
+                        'warm_up': None, 'first_query': None}
+
+    def warm_up(self) -> Dict:
+        """Pay one-off costs before the first real query and return their timings in seconds.
+
+        Runs a throwaway embedding (loading the model), a search over the store (building
+        lazy index structures and faulting in memory-mapped rows) and creates the LLM
+        client. Nothing is sent to the model endpoint.
+        """
+        timings = {}
+        started = time.perf_counter()
+        query_vector = self.embedding_manager.embed(["warm up"])[0]
+        timings['embed'] = time.perf_counter() - started
+        if len(self.vector_store):
+            mark = time.perf_counter()
+            self._search("warm up", None if self.retrieval_mode == "lexical" else query_vector)
+            timings['search'] = time.perf_counter() - mark
+        mark = time.perf_counter()
+        try:
+            get_client()
+            timings['llm_client'] = time.perf_counter() - mark
+        except Exception as e:
+            # Missing credentials surface on the first query; retrieval still works
+            print(f"LLM client not created during warm-up: {e}")
+        timings['total'] = time.perf_counter() - started
+        self.startup['warm_up'] = timings['total']
+        print(f"Warm-up finished in {timings['total']:.2f}s")
+        return timings
+
+    def _mark_first_query(self):
+        if self.startup['first_query'] is None:
+            self.startup['first_query'] = time.perf_counter() - _IMPORT_STARTED
+            print(f"Time to first query: {self.startup['first_query']:.2f}s "
+                  f"(import {self.startup['import']:.2f}s, init {self.startup['init']:.2f}s)")
+
+    def _resolve_retrieval_mode(self, mode: str) -> str:
+        if mode == "auto":
+            return "hybrid" if self.embedding_manager.is_sparse else "dense"
+        if mode not in ("dense", "lexical", "hybrid"):
+            raise ValueError(f"Unknown RETRIEVAL_MODE: {mode}")
+        return mode
+
+    def _new_store(self) -> VectorStore:
+        return SparseVectorStore() if self.embedding_manager.is_sparse else VectorStore()
+
+    def _ensure_lexical(self):
+        if self.retrieval_mode != "dense":
+            self.vector_store.enable_lexical()
+
+    def ingest_documents(self, directory: str = DOCS_PATH, batch_size: int = EMBED_BATCH_SIZE,
+                         incremental: bool = True, progress: Callable[[Dict], None] = None):
+        """Stream ``directory`` into the store.
+
+        Chunks are pulled from the loader as files are parsed and embedded ``batch_size``
+        at a time, so peak memory is bounded by the batch rather than the corpus.
+        ``progress`` is called after every batch with files/chunks counters.
+
+        With ``incremental=True`` only new or modified files are loaded and embedded;
+        chunks of modified or deleted files are removed first. Otherwise the store is
+        rebuilt from scratch.
+        """
+        if not incremental:
+            self.vector_store = self._new_store()
+            self.manifest = {}
+        self._ensure_lexical()
+
+        paths = list_document_paths(directory)
+        plan = plan_incremental(paths, self.manifest)
+        print(f"Ingest plan: {len(plan['to_load'])} new/modified, {len(plan['skipped'])} unchanged, "
+              f"{len(plan['deleted'])} deleted")
 
-    def ingest_documents(self, directory: str = DOCS_PATH):
-        result = load_documents_from_directory(directory)
-        chunks = result['chunks']
-        self.loaded_files = result['sources']
+        removed = plan['changed'] + plan['deleted']
+        chunks_removed = self.vector_store.remove_sources(removed)
+        if chunks_removed:
+            print(f"Removed {chunks_removed} chunks from {len(removed)} modified/deleted files")
 
-        if not chunks:
+        report = {}
+        chunks_added = 0
+        duplicates = 0
+        batch = []
+
+        def flush():
+            nonlocal chunks_added, duplicates, batch
+            texts = [chunk.page_content for chunk in batch]
+            metadatas = [chunk.metadata if hasattr(chunk, 'metadata') else {} for chunk in batch]
+            # Chunks whose text is already stored for the same source are not embedded again
+            fresh = self.vector_store.chunks.unseen(texts, metadatas)
+            duplicates += len(texts) - len(fresh)
+            metrics.inc("chunks_deduplicated", len(texts) - len(fresh))
+            if len(fresh) < len(texts):
+                texts = [texts[i] for i in fresh]
+                metadatas = [metadatas[i] for i in fresh]
+            if texts:
+                with metrics.timer("embed"):
+                    vectors = self.embedding_manager.embed(texts, batch_size=batch_size)
+                with metrics.timer("index_add"):
+                    self.vector_store.add_batch(vectors, texts, metadatas)
+            metrics.inc("chunks_embedded", len(texts))
+            metrics.inc("chunk_tokens", sum(len(text.split()) for text in texts))
+            chunks_added += len(texts)
+            batch = []
+            info = {'files_done': report['files_done'], 'files_total': len(plan['to_load']),
+                    'chunks_done': chunks_added}
+            if progress is not None:
+                progress(info)
+            else:
+                print(f"  Embedded {info['chunks_done']} chunks ({info['files_done']}/{info['files_total']} files)")
+
+        for chunk in iter_chunks(plan['to_load'], report=report):
+            batch.append(chunk)
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+
+        # Drop partial output of files that failed mid-stream; leaving them out of the
+        # manifest makes the next ingest retry them
+        failed = {e['source'] for e in report.get('errors', [])}
+        chunks_added -= self.vector_store.remove_sources(failed)
+        with metrics.timer("index_build"):
+            self._refresh_ann()
+            self._refresh_quantization()
+        for timings in report.get('timings', []):
+            for stage in ('load', 'split'):
+                if stage in timings:
+                    metrics.observe(stage, timings[stage])
+        metrics.inc("files_loaded", len(report.get('sources', [])))
+        metrics.inc("files_failed", len(failed))
+        self.manifest = {path: fp for path, fp in plan['fingerprints'].items() if path not in failed}
+        self.loaded_files = sorted(self.manifest)
+
+        if not len(self.vector_store):
             raise ValueError("No documents found in the specified directory.")
 
-        print(f"Starting ingestion of {len(chunks)} chunks...")
+        print(f"Ingestion complete: {chunks_added} chunks stored ({duplicates} duplicates skipped)")
+        self._publish_metrics()
+        return {
+            'sources': self.loaded_files,
+            'added': [path for path in plan['to_load'] if path not in failed],
+            'skipped': plan['skipped'],
+            'removed': removed,
+            'chunks_added': chunks_added,
+            'chunks_removed': chunks_removed,
+            'chunks_deduplicated': duplicates,
+            'errors': report.get('errors', []),
+        }
 
-        for chunk in chunks:
-            text = chunk.page_content
-            metadata = chunk.metadata if hasattr(chunk, 'metadata') else {}
-            vector = self.embedding_manager.embed_texts([text])
-            self.vector_store.add(vector, text, metadata)
+    def _refresh_ann(self):
+        """Build (or rebuild after large growth) the approximate index once the store is big enough.
 
-        print(f"Ingestion complete: {len(chunks)} chunks stored")
-        return {'sources': self.loaded_files}
+        Off unless ``ANN_MIN_ROWS`` is set.
+        """
+        store = self.vector_store
+        if not ANN_MIN_ROWS or len(store) < ANN_MIN_ROWS or not store.supports_ann:
+            store.ann = None
+        elif store.ann is None or store.ann.needs_retrain():
+            store.build_ann(nlist=ANN_NLIST or None, nprobe=ANN_NPROBE)
 
-    def query(self, question: str, show_chunks: bool = False) -> Dict:
-        if not self.vector_store.embeddings:
-            raise ValueError("The vector store is empty. Please ingest documents first.")
+    def _refresh_quantization(self):
+        """(Re)build the compressed codes when the configured mode changed or the store outgrew them."""
+        store = self.vector_store
+        store.rerank_candidates = QUANT_RERANK
+        if VECTOR_QUANTIZATION == "pq" and not QUANT_RERANK:
+            print("Warning: PQ without re-ranking (QUANT_RERANK=0) ranks by approximate scores; expect low recall")
+        if VECTOR_QUANTIZATION == "none" or not store.supports_ann:
+            store.quantize("none")
+        elif store.quantizer is None or store.quantizer.mode != VECTOR_QUANTIZATION or \
+                store.quantizer.needs_retrain():
+            kwargs = {'m': PQ_SUBVECTORS} if VECTOR_QUANTIZATION == "pq" else {}
+            store.quantize(VECTOR_QUANTIZATION, **kwargs)
 
-        from .config import MIN_SCORE_THRESHOLD
+    def save_index(self, path: str = INDEX_PATH):
+        with atomic_directory(path) as tmp_path:
+            self.vector_store.save(tmp_path)
+            self.embedding_manager.save(tmp_path)
+            with open(os.path.join(tmp_path, self.MANIFEST_FILE), "w", encoding="utf-8") as f:
+                json.dump(self.manifest, f)
+        print(f"Index saved to {path} ({len(self.vector_store)} chunks)")
 
-        query_vector = self.embedding_manager.embed_texts([question])
-        retrived_chunks = self.vector_store.search(query_vector, top_k=TOP_K)
+    def load_index(self, path: str = INDEX_PATH, mmap: bool = True) -> bool:
+        """Replace the current store with the index saved at ``path``; returns False if there is none."""
+        if not (VectorStore.exists(path) or SparseVectorStore.exists(path)):
+            return False
+        self.embedding_manager.load(path)  # raises if the index was built with the other embedding mode
+        self.vector_store = type(self._new_store()).load(path, mmap=mmap)
+        self._ensure_lexical()
+        self._refresh_quantization()
+        manifest_path = os.path.join(path, self.MANIFEST_FILE)
+        if os.path.exists(manifest_path):
+            with open(manifest_path, encoding="utf-8") as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {}
+        self.loaded_files = sorted(self.manifest) or sorted(self.vector_store.get_all_sources())
+        print(f"Index loaded from {path} ({len(self.vector_store)} chunks)")
+        return True
 
-        # Filter out low-relevance chunks to reduce noise
-        retrived_chunks = [c for c in retrived_chunks if c['score'] >= MIN_SCORE_THRESHOLD]
+    @staticmethod
+    def _cache_get(cache: LRUCache, name: str, key):
+        value = cache.get(key)
+        metrics.inc("cache_hits" if value is not None else "cache_misses", cache=name)
+        return value
 
-        # Extract text strings from dict results
-        texts = [chunk['text'] for chunk in retrived_chunks]
-        sources = [chunk.get('metadata', {}).get('source', 'Unknown') for chunk in retrived_chunks]
+    @staticmethod
+    def _publish_metrics():
+        if METRICS_FILE:
+            metrics.write_prometheus(METRICS_FILE)
+
+    def _query_vector(self, key: str, question: str):
+        query_vector = self._cache_get(self.query_cache, "query_embeddings", key)
+        if query_vector is None:
+            with metrics.timer("embed_query"):
+                query_vector = self.embedding_manager.embed([question])[0]
+            self.query_cache.put(key, query_vector)
+        return query_vector
+
+    @staticmethod
+    def _is_relevant(chunk: Dict) -> bool:
+        # Filter out low-relevance chunks to reduce noise; a keyword match also counts
+        if chunk.get('lexical_score', 0.0) > 0:
+            return True
+        if 'dense_score' in chunk:
+            return chunk['dense_score'] >= MIN_SCORE_THRESHOLD
+        return 'lexical_score' not in chunk and chunk['score'] >= MIN_SCORE_THRESHOLD
+
+    def _search(self, question: str, query_vector, filters: Dict = None) -> List[Dict]:
+        with metrics.timer("search"):
+            if self.retrieval_mode == "lexical":
+                hits = self.vector_store.search_lexical(question, top_k=TOP_K, filters=filters)
+            elif self.retrieval_mode == "hybrid":
+                hits = self.vector_store.search_hybrid(query_vector, question, top_k=TOP_K, filters=filters)
+            else:
+                hits = self.vector_store.search(query_vector, top_k=TOP_K, filters=filters)
+        relevant = [c for c in hits if self._is_relevant(c)]
+        metrics.inc("queries")
+        metrics.inc("chunks_retrieved", len(relevant))
+        return relevant
+
+    def _retrieve(self, question: str, filters: Dict = None):
+        """Embed ``question`` (through the query cache) and return its cache key and relevant chunks.
+
+        ``filters`` restricts retrieval, e.g. ``{'sources': ['report.pdf'], 'file_types': ['.csv'],
+        'rows': (0, 99)}``; see ``VectorStore.filter_rows``.
+        """
+        if not len(self.vector_store):
+            raise ValueError("The vector store is empty. Please ingest documents first.")
 
-        if not texts:
-            return {
-                "answer": "No relevant information found in the uploaded documents.",
-                "source_used": 0,
-                "documents": self.loaded_files,
-                "chunks": [],
-            }
+        key = self._normalize_question(question)
+        query_vector = None if self.retrieval_mode == "lexical" else self._query_vector(key, question)
+        return key, self._search(question, query_vector, filters)
 
+    @staticmethod
+    def _build_prompt(question: str, texts) -> str:
         context = "\n\n".join(texts)
 
-        prompt = f"""You are a precise information extraction assistant analyzing document content.
+        return f"""You are a precise information extraction assistant analyzing document content.
 
 Your task: Extract ONLY factual information from the context below to answer the question.
 
@@ -77,7 +316,49 @@ CONTEXT FROM DOCUMENTS:
 QUESTION: {question}
 
 ANSWER (based strictly on context above):"""
-        answer = generate_answer(prompt)
+
+    def _prompt(self, question: str, chunks):
+        """Prompt for ``question`` from the token-budgeted context, plus the context builder's report."""
+        with metrics.timer("prompt_build"):
+            texts, context = self.context_builder.build(chunks, self.vector_store)
+            prompt = self._build_prompt(question, texts)
+        context['prompt_tokens'] = count_tokens(prompt)
+        metrics.inc("prompt_tokens", context['prompt_tokens'])
+        metrics.inc("context_tokens_saved", context['tokens_saved'])
+        return prompt, context
+
+    @staticmethod
+    def _generate(prompt: str) -> str:
+        with metrics.timer("llm"):
+            answer = generate_answer(prompt)
+        metrics.inc("completion_tokens", len(answer.split()))
+        return answer
+
+    @staticmethod
+    async def _agenerate(prompt: str) -> str:
+        with metrics.timer("llm"):
+            answer = await agenerate_answer(prompt)
+        metrics.inc("completion_tokens", len(answer.split()))
+        return answer
+
+    def _answer_key(self, key: str, chunks):
+        # Chunk ids are row numbers, which shift when the store changes: drop stale answers
+        if self._answer_cache_version != self.vector_store.version:
+            self.answer_cache.clear()
+            self._answer_cache_version = self.vector_store.version
+        return (key, tuple(chunk['id'] for chunk in chunks), LLM_MODEL)
+
+    def _cache_answer(self, answer_key, answer: str):
+        if not answer.startswith("Error generating answer"):
+            self.answer_cache.put(answer_key, answer)
+
+    def _result(self, answer, chunks, show_chunks: bool, cached: bool, context: Dict = None) -> Dict:
+        if isinstance(answer, str):
+            self._mark_first_query()  # streamed answers are marked at their first token instead
+            self._publish_metrics()
+        # Extract text strings from dict results
+        texts = [chunk['text'] for chunk in chunks]
+        sources = [chunk.get('metadata', {}).get('source', 'Unknown') for chunk in chunks]
 
         # Prepare chunk info if requested
         chunk_info = []
@@ -95,8 +376,175 @@ ANSWER (based strictly on context above):"""
             "source_used": len(texts),
             "documents": self.loaded_files,
             "chunks": chunk_info if show_chunks else [],
+            "cached": cached,
+            "context": context,  # token report of the prompt context; None when no prompt was built
         }
 
+    def query(self, question: str, show_chunks: bool = False, filters: Dict = None) -> Dict:
+        with metrics.timer("query"):
+            key, retrived_chunks = self._retrieve(question, filters)
+            if not retrived_chunks:
+                return self._result(NO_ANSWER, [], show_chunks, False)
+
+            answer_key = self._answer_key(key, retrived_chunks)
+            answer = self._cache_get(self.answer_cache, "answers", answer_key)
+            cached = answer is not None
+            context = None
+            if not cached:
+                prompt, context = self._prompt(question, retrived_chunks)
+                answer = self._generate(prompt)
+                self._cache_answer(answer_key, answer)
+            return self._result(answer, retrived_chunks, show_chunks, cached, context)
+
+    def query_stream(self, question: str, show_chunks: bool = False, filters: Dict = None) -> Dict:
+        """Like ``query`` but ``answer`` is an iterator of tokens, so the first token can be shown early."""
+        key, retrived_chunks = self._retrieve(question, filters)
+        if not retrived_chunks:
+            self._mark_first_query()
+            return self._result(iter([NO_ANSWER]), [], show_chunks, False)
+
+        answer_key = self._answer_key(key, retrived_chunks)
+        answer = self._cache_get(self.answer_cache, "answers", answer_key)
+        if answer is not None:
+            self._mark_first_query()
+            return self._result(iter([answer]), retrived_chunks, show_chunks, True)
+
+        prompt, context = self._prompt(question, retrived_chunks)
+
+        def tokens():
+            parts = []
+            started = time.perf_counter()
+            for token in stream_answer(prompt):
+                if not parts:
+                    metrics.observe("llm_first_token", time.perf_counter() - started)
+                    self._mark_first_query()
+                parts.append(token)
+                yield token
+            metrics.observe("llm", time.perf_counter() - started)
+            answer = "".join(parts)
+            metrics.inc("completion_tokens", len(answer.split()))
+            self._cache_answer(answer_key, answer)
+            self._publish_metrics()
+
+        return self._result(tokens(), retrived_chunks, show_chunks, False, context)
+
+    async def aquery(self, question: str, show_chunks: bool = False, filters: Dict = None) -> Dict:
+        """Async ``query``: generation goes through the pooled, concurrency-limited async client."""
+        with metrics.timer("query"):
+            key, retrived_chunks = self._retrieve(question, filters)
+            if not retrived_chunks:
+                return self._result(NO_ANSWER, [], show_chunks, False)
+
+            answer_key = self._answer_key(key, retrived_chunks)
+            answer = self._cache_get(self.answer_cache, "answers", answer_key)
+            cached = answer is not None
+            context = None
+            if not cached:
+                prompt, context = self._prompt(question, retrived_chunks)
+                answer = await self._agenerate(prompt)
+                self._cache_answer(answer_key, answer)
+            return self._result(answer, retrived_chunks, show_chunks, cached, context)
+
+    def query_batch(self, questions: List[str], show_chunks: bool = False,
+                    max_concurrency: int = LLM_MAX_CONCURRENCY, filters: Dict = None) -> List[Dict]:
+        """Answer many questions; results are in the order of ``questions``.
+
+        Uncached questions are embedded in one batch and scored against the store with
+        a matrix-matrix product; generation calls run concurrently, at most
+        ``max_concurrency`` at a time. ``filters`` applies to every question. Use
+        ``aquery_batch`` from inside an event loop.
+        """
+        async def run():
+            try:
+                return await self.aquery_batch(questions, show_chunks=show_chunks, max_concurrency=max_concurrency,
+                                               filters=filters)
+            finally:
+                # asyncio.run closes its loop, and the loop's pooled client with its connections would leak
+                await close_async_client()
+
+        return asyncio.run(run())
+
+    def retrieve_batch(self, questions: List[str], filters: Dict = None) -> List[List[Dict]]:
+        """Relevant chunks for each of ``questions``, embedding and searching them together."""
+        keys, retrieved = self._retrieve_batch(questions, filters)
+        return [retrieved[key] for key in keys]
+
+    def _retrieve_batch(self, questions: List[str], filters: Dict = None):
+        """Cache keys of ``questions`` and the relevant chunks per distinct key."""
+        if not questions:
+            return [], {}
+        if not len(self.vector_store):
+            raise ValueError("The vector store is empty. Please ingest documents first.")
+
+        keys = [self._normalize_question(q) for q in questions]
+        originals = {}
+        for key, question in zip(keys, questions):
+            originals.setdefault(key, question)
+        distinct = list(originals)
+
+        if self.retrieval_mode == "lexical":
+            retrieved = {key: self._search(originals[key], None, filters) for key in distinct}
+        else:
+            vectors = {key: self._cache_get(self.query_cache, "query_embeddings", key) for key in distinct}
+            missing = [key for key, vector in vectors.items() if vector is None]
+            if missing:
+                # Embed each distinct question once, using its first original spelling
+                with metrics.timer("embed_query"):
+                    embedded = self.embedding_manager.embed([originals[key] for key in missing],
+                                                            batch_size=EMBED_BATCH_SIZE)
+                for key, vector in zip(missing, embedded):
+                    vectors[key] = vector
+                    self.query_cache.put(key, vector)
+            if self.retrieval_mode == "hybrid":
+                retrieved = {key: self._search(originals[key], vectors[key], filters) for key in distinct}
+            else:
+                with metrics.timer("search"):
+                    hits = self.vector_store.search_batch([vectors[key] for key in distinct], top_k=TOP_K,
+                                                          filters=filters)
+                retrieved = {key: [c for c in row if self._is_relevant(c)] for key, row in zip(distinct, hits)}
+                metrics.inc("queries", len(distinct))
+                metrics.inc("chunks_retrieved", sum(len(chunks) for chunks in retrieved.values()))
+        return keys, retrieved
+
+    async def aquery_batch(self, questions: List[str], show_chunks: bool = False,
+                           max_concurrency: int = LLM_MAX_CONCURRENCY, filters: Dict = None,
+                           executor=None) -> List[Dict]:
+        """Async ``query_batch``. With ``executor``, embedding and search run on it instead of the event loop."""
+        if executor is not None:
+            keys, retrieved = await asyncio.get_running_loop().run_in_executor(
+                executor, self._retrieve_batch, questions, filters)
+        else:
+            keys, retrieved = self._retrieve_batch(questions, filters)
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+        async def answer(question: str, key: str) -> Dict:
+            chunks = retrieved[key]
+            if not chunks:
+                return self._result(NO_ANSWER, [], show_chunks, False)
+            answer_key = self._answer_key(key, chunks)
+            cached_answer = self._cache_get(self.answer_cache, "answers", answer_key)
+            if cached_answer is not None:
+                return self._result(cached_answer, chunks, show_chunks, True)
+            prompt, context = self._prompt(question, chunks)
+            async with semaphore:
+                generated = await self._agenerate(prompt)
+            self._cache_answer(answer_key, generated)
+            return self._result(generated, chunks, show_chunks, False, context)
+
+        # Repeated questions share one cache key, so each is answered (and generated) once
+        originals = {}
+        for question, key in zip(questions, keys):
+            originals.setdefault(key, question)
+        answers = dict(zip(originals, await asyncio.gather(*(answer(q, key) for key, q in originals.items()))))
+        return [dict(answers[key]) for key in keys]
+
+    @staticmethod
+    def _normalize_question(question: str) -> str:
+        return " ".join(question.lower().split())
+
+    def cache_stats(self) -> Dict:
+        return {'query_embeddings': self.query_cache.stats(), 'answers': self.answer_cache.stats()}
+
     def chat(self):
         print("\nRAG Chat")
         print("Type 'exit' or 'quit' to stop\n")
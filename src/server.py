@@ -0,0 +1,467 @@
+"""Headless HTTP query service over a saved index.
+
+    python -m src.server --port 8000 --workers 4
+
+The parent process binds the socket and forks ``workers`` processes that all accept on
+it (and restarts any that die). Each worker memory-maps the index at ``INDEX_PATH``
+read-only: the embedding rows (dense or sparse), chunk texts, BM25 postings, IVF
+assignments and quantization codes are held once in the OS page cache no matter how
+many workers run. Each worker still keeps its own embedding model, BM25 vocabulary,
+per-row chunk offsets and metadata columns, and IVF inverted lists.
+
+Endpoints (JSON in and out):
+
+    POST /query         {"question": "...", "filters": {...}, "show_chunks": false}
+    POST /search        {"question": "...", "filters": {...}} -> relevant chunks, no LLM call
+    GET  /healthz       worker pid and the loaded index
+    GET  /metrics       Prometheus text of the worker that answered
+    POST /admin/reload  make every worker reload the index now
+
+Requests arriving within ``BATCH_WINDOW_MS`` of each other are embedded and searched
+together on a worker thread, so a large batch does not stall other connections. Workers notice when the index directory is replaced (``save_index`` swaps it
+atomically) and load the new one in the background. Requests already in flight finish
+on the index they started with, so there is no downtime. ``SIGHUP`` to the parent
+forces a reload in every worker.
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, List, Tuple
+from .rag_pipeline import RAGPipeline
+from .metrics import metrics
+from .llm import close_async_client
+from .vector_store import check_filters
+from .config import (
+    INDEX_PATH, SERVER_HOST, SERVER_PORT, SERVER_WORKERS, BATCH_WINDOW_MS, BATCH_MAX_SIZE, INDEX_POLL_SECONDS,
+)
+
+MAX_BODY_BYTES = 1 << 20
+SHUTDOWN_GRACE_SECONDS = 10.0
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class MicroBatcher:
+    """Gather items submitted within ``window`` seconds (at most ``max_size``) into one ``handler`` call.
+
+    ``handler`` receives the list of items and returns one result per item, in order;
+    a result that is an exception is raised to that item's caller only.
+    """
+
+    def __init__(self, handler: Callable[[List], Awaitable[List]], window: float, max_size: int):
+        self.handler = handler
+        self.window = window
+        self.max_size = max(1, max_size)
+        self._pending: List[Tuple[object, asyncio.Future]] = []
+        self._timer = None
+        self._tasks = set()
+
+    async def submit(self, item):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch):
+        metrics.inc("server_batches")
+        metrics.inc("server_batched_requests", len(batch))
+        try:
+            results = await self.handler([item for item, _ in batch])
+        except Exception as e:
+            results = [e] * len(batch)
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+class QueryService:
+    """One worker: a ``RAGPipeline`` over the saved index, replaced as a whole when the index changes."""
+
+    def __init__(self, index_path: str = INDEX_PATH, window: float = BATCH_WINDOW_MS / 1000,
+                 max_batch: int = BATCH_MAX_SIZE, parent_pid: int = None):
+        self.index_path = index_path
+        self.parent_pid = parent_pid
+        self.pipeline = None
+        self.index_info: Dict = {}
+        self.active_requests = 0
+        self._stamp = None
+        self._reload_lock = asyncio.Lock()
+        # Embedding and search are CPU-bound; one thread runs them so the event loop keeps
+        # accepting connections, and pipeline state is never touched by two threads at once
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="retrieval")
+        self.queries = MicroBatcher(self._answer_batch, window, max_batch)
+        self.searches = MicroBatcher(self._search_batch, window, max_batch)
+        self._routes = {
+            ("POST", "/query"): self._query,
+            ("POST", "/search"): self._search,
+            ("GET", "/healthz"): self._health,
+            ("GET", "/metrics"): self._metrics,
+            ("POST", "/admin/reload"): self._admin_reload,
+        }
+
+    @staticmethod
+    def _index_stamp(path: str):
+        # atomic_directory swaps in a new directory, so its inode changes on every save
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _load(self):
+        pipeline = RAGPipeline()  # the embedding model is a process-wide singleton, so this is cheap
+        return pipeline if pipeline.load_index(self.index_path) else None
+
+    async def reload(self, force: bool = False) -> bool:
+        """Load the index if it changed since the last load (or always with ``force``); True if swapped."""
+        async with self._reload_lock:
+            stamp = self._index_stamp(self.index_path)
+            if stamp is None or (stamp == self._stamp and not force):
+                return False
+            started = time.perf_counter()
+            try:
+                pipeline = await asyncio.get_running_loop().run_in_executor(None, self._load)
+            except Exception as e:
+                # e.g. the directory was swapped again mid-load; the next poll sees the new stamp
+                print(f"[worker {os.getpid()}] Index reload failed: {type(e).__name__}: {e}")
+                self._stamp = stamp
+                return False
+            if pipeline is None:
+                return False
+            # Batches already running keep a reference to the pipeline they started with
+            self.pipeline = pipeline
+            self._stamp = stamp
+            self.index_info = {'path': self.index_path, 'chunks': len(pipeline.vector_store),
+                               'sources': len(pipeline.loaded_files), 'loaded_at': time.time(),
+                               'load_seconds': time.perf_counter() - started}
+            metrics.inc("index_reloads")
+            print(f"[worker {os.getpid()}] Serving index {self.index_path} ({self.index_info['chunks']} chunks)")
+            return True
+
+    async def watch(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            await self.reload()
+
+    def _current_pipeline(self) -> RAGPipeline:
+        if self.pipeline is None:
+            raise HTTPError(503, f"No index loaded from {self.index_path}")
+        return self.pipeline
+
+    @staticmethod
+    def _groups(requests: List[Dict]) -> Dict:
+        # aquery_batch/retrieve_batch take one filter for the whole batch
+        groups: Dict[Tuple, List[int]] = {}
+        for i, request in enumerate(requests):
+            key = (json.dumps(request.get('filters'), sort_keys=True), bool(request.get('show_chunks')))
+            groups.setdefault(key, []).append(i)
+        return groups
+
+    async def _answer_batch(self, requests: List[Dict]) -> List:
+        pipeline = self._current_pipeline()
+        results = [None] * len(requests)
+
+        async def answer(indices: List[int]):
+            first = requests[indices[0]]
+            try:
+                answers = await pipeline.aquery_batch([requests[i]['question'] for i in indices],
+                                                      show_chunks=bool(first.get('show_chunks')),
+                                                      filters=first.get('filters'), executor=self.executor)
+            except Exception as e:
+                answers = [e] * len(indices)
+            for i, result in zip(indices, answers):
+                results[i] = result
+
+        await asyncio.gather(*(answer(indices) for indices in self._groups(requests).values()))
+        return results
+
+    async def _search_batch(self, requests: List[Dict]) -> List:
+        pipeline = self._current_pipeline()
+        loop = asyncio.get_running_loop()
+        results = [None] * len(requests)
+        for indices in self._groups(requests).values():
+            try:
+                hits = await loop.run_in_executor(self.executor, pipeline.retrieve_batch,
+                                                  [requests[i]['question'] for i in indices],
+                                                  requests[indices[0]].get('filters'))
+            except Exception as e:
+                hits = [e] * len(indices)
+            for i, chunks in zip(indices, hits):
+                results[i] = chunks if isinstance(chunks, Exception) else {'chunks': chunks}
+        return results
+
+    @staticmethod
+    def _question_request(body: bytes) -> Dict:
+        try:
+            request = json.loads(body or b"{}")
+        except ValueError:
+            raise HTTPError(400, "Request body must be JSON")
+        if not isinstance(request, dict) or not isinstance(request.get('question'), str) \
+                or not request['question'].strip():
+            raise HTTPError(400, 'Expected {"question": "..."}')
+        try:
+            check_filters(request.get('filters'))
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+        return request
+
+    async def _query(self, body: bytes):
+        return await self.queries.submit(self._question_request(body))
+
+    async def _search(self, body: bytes):
+        return await self.searches.submit(self._question_request(body))
+
+    async def _health(self, body: bytes):
+        return {'status': "ok" if self.pipeline is not None else "no_index", 'pid': os.getpid(),
+                'index': self.index_info, 'active_requests': self.active_requests}
+
+    async def _metrics(self, body: bytes):
+        return metrics.prometheus()
+
+    async def _admin_reload(self, body: bytes):
+        if self.parent_pid and self.parent_pid == os.getppid():
+            # the parent forwards SIGHUP to every worker, including this one
+            os.kill(self.parent_pid, signal.SIGHUP)
+            return {'reload': "signalled all workers"}
+        return {'reloaded': await self.reload(force=True), 'index': self.index_info}
+
+    async def dispatch(self, method: str, path: str, body: bytes):
+        handler = self._routes.get((method, path))
+        if handler is None:
+            if any(route_path == path for _, route_path in self._routes):
+                raise HTTPError(405, f"{method} not allowed on {path}")
+            raise HTTPError(404, f"No route for {path}")
+        try:
+            return await handler(body)
+        except HTTPError:
+            raise
+        except ValueError as e:
+            # raised by the pipeline for an empty store or bad filters
+            raise HTTPError(400, str(e))
+        except Exception as e:
+            traceback.print_exc()
+            raise HTTPError(500, f"{type(e).__name__}: {e}")
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve HTTP/1.1 requests on one connection, keeping it open between requests."""
+        try:
+            while True:
+                keep_alive = False
+                try:
+                    request = await _read_request(reader)
+                    if request is None:
+                        break
+                    method, path, version, headers, body = request
+                    keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                    self.active_requests += 1
+                    try:
+                        with metrics.timer("request"):
+                            payload = await self.dispatch(method, path, body)
+                    finally:
+                        self.active_requests -= 1
+                    status = 200
+                except HTTPError as e:
+                    status, payload = e.status, {'error': e.message}
+                writer.write(_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def _read_request(reader: asyncio.StreamReader):
+    """``(method, path, version, headers, body)`` of the next request, or None when the client closed."""
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError as e:
+        if e.partial.strip():
+            raise HTTPError(400, "Incomplete request")
+        return None
+    except asyncio.LimitOverrunError:
+        raise HTTPError(413, "Request headers too large")
+    lines = head.decode("latin-1").split("\r\n")
+    try:
+        method, target, version = lines[0].split(" ", 2)
+    except ValueError:
+        raise HTTPError(400, "Malformed request line")
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length") or 0)
+    except ValueError:
+        raise HTTPError(400, "Invalid Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(413, f"Request body over {MAX_BODY_BYTES} bytes")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), target.split("?", 1)[0], version.strip(), headers, body
+
+
+def _response(status: int, payload, keep_alive: bool) -> bytes:
+    if isinstance(payload, str):
+        body, content_type = payload.encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8"
+    else:
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+        content_type = "application/json"
+    head = (f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode("latin-1") + body
+
+
+async def _run_worker(sock: socket.socket, service: QueryService, poll_seconds: float):
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    reloads = set()
+
+    def reload_now():
+        task = asyncio.ensure_future(service.reload(force=True))
+        reloads.add(task)
+        task.add_done_callback(reloads.discard)
+
+    for signum, callback in ((getattr(signal, "SIGTERM", None), stop.set), (getattr(signal, "SIGINT", None), stop.set),
+                             (getattr(signal, "SIGHUP", None), reload_now)):
+        if signum is not None:
+            try:
+                loop.add_signal_handler(signum, callback)
+            except NotImplementedError:  # Windows event loops
+                pass
+
+    await service.reload(force=True)
+    if service.pipeline is not None:
+        await loop.run_in_executor(None, service.pipeline.warm_up)
+    server = await asyncio.start_server(service.handle_connection, sock=sock)
+    watcher = asyncio.create_task(service.watch(poll_seconds)) if poll_seconds > 0 else None
+    host, port = sock.getsockname()[:2]
+    print(f"[worker {os.getpid()}] Listening on http://{host}:{port}")
+    await stop.wait()
+
+    server.close()
+    if watcher is not None:
+        watcher.cancel()
+    deadline = time.monotonic() + SHUTDOWN_GRACE_SECONDS
+    while service.active_requests and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+    service.executor.shutdown(wait=False)
+    await close_async_client()
+
+
+def run_worker(sock: socket.socket, index_path: str = INDEX_PATH, poll_seconds: float = INDEX_POLL_SECONDS,
+               window: float = BATCH_WINDOW_MS / 1000, max_batch: int = BATCH_MAX_SIZE, parent_pid: int = None):
+    async def main():
+        service = QueryService(index_path, window=window, max_batch=max_batch, parent_pid=parent_pid)
+        await _run_worker(sock, service, poll_seconds)
+    asyncio.run(main())
+
+
+def serve(host: str = SERVER_HOST, port: int = SERVER_PORT, workers: int = SERVER_WORKERS,
+          index_path: str = INDEX_PATH, poll_seconds: float = INDEX_POLL_SECONDS,
+          window: float = BATCH_WINDOW_MS / 1000, max_batch: int = BATCH_MAX_SIZE):
+    """Bind ``host:port`` and serve with ``workers`` forked processes (in-process without ``os.fork``)."""
+    sock = socket.create_server((host, port), backlog=1024)
+    worker_args = (index_path, poll_seconds, window, max_batch)
+    if workers <= 1 or not hasattr(os, "fork"):
+        run_worker(sock, *worker_args)
+        return
+
+    children = set()
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            for signum in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT):
+                signal.signal(signum, signal.SIG_DFL)
+            code = 0
+            try:
+                run_worker(sock, *worker_args, parent_pid=os.getppid())
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            finally:
+                os._exit(code)
+        children.add(pid)
+
+    def forward(signum, frame):
+        for pid in list(children):
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    def shutdown(signum, frame):
+        nonlocal stopping
+        stopping = True
+        forward(signal.SIGTERM, frame)
+
+    signal.signal(signal.SIGHUP, forward)
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    print(f"Starting {workers} workers on http://{host}:{port} (index: {index_path})")
+    for _ in range(workers):
+        spawn()
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        children.discard(pid)
+        if not stopping:
+            print(f"Worker {pid} exited with status {status}; restarting")
+            time.sleep(1)  # don't spin if workers crash on startup
+            spawn()
+    sock.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS)
+    parser.add_argument("--index", default=INDEX_PATH, help="index directory written by save_index")
+    parser.add_argument("--poll", type=float, default=INDEX_POLL_SECONDS,
+                        help="seconds between index change checks (0 = reload only on SIGHUP)")
+    parser.add_argument("--batch-window-ms", type=float, default=BATCH_WINDOW_MS)
+    parser.add_argument("--batch-max", type=int, default=BATCH_MAX_SIZE)
+    args = parser.parse_args(argv)
+    serve(args.host, args.port, args.workers, args.index, args.poll, args.batch_window_ms / 1000, args.batch_max)
+
+
+if __name__ == "__main__":
+    main()
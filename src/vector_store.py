@@ -1,56 +1,614 @@
+import itertools
+import json
+import os
+import shutil
+from contextlib import contextmanager
 import numpy as np
+import scipy.sparse as sp
 from typing import List, Dict
+from .ann_index import IVFIndex
+from .array_files import load_arrays, save_arrays
+from .chunk_store import ChunkStore
+from .lexical_index import BM25Index, reciprocal_rank_fusion
+from .quantization import load_codec, make_codec
+
+
+@contextmanager
+def atomic_directory(path: str):
+    """Yield a scratch directory that replaces ``path`` once the block finishes without error.
+
+    Readers never observe a half-written index: they see either the old directory or the new one.
+    """
+    tmp_path = f"{path}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    try:
+        yield tmp_path
+    except BaseException:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+    old_path = f"{path}.old"
+    shutil.rmtree(old_path, ignore_errors=True)
+    if os.path.exists(path):
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+
+def check_filters(filters: Dict = None) -> Dict:
+    """``filters`` as ``filter_rows`` keyword arguments, or ValueError describing what is wrong with them."""
+    if filters is None:
+        return {}
+    if not isinstance(filters, dict):
+        raise ValueError("filters must be a dict")
+    unknown = set(filters) - {'sources', 'file_types', 'rows'}
+    if unknown:
+        raise ValueError(f"Unknown filter keys: {', '.join(sorted(map(str, unknown)))} "
+                         "(expected sources, file_types, rows)")
+    for key in ('sources', 'file_types'):
+        values = filters.get(key)
+        if values is not None and (isinstance(values, str) or not isinstance(values, (list, tuple, set))
+                                   or not all(isinstance(v, str) for v in values)):
+            raise ValueError(f"filters['{key}'] must be a list of strings")
+    rows = filters.get('rows')
+    if rows is not None and (not isinstance(rows, (list, tuple)) or len(rows) != 2
+                             or not all(isinstance(n, int) and not isinstance(n, bool) for n in rows)):
+        raise ValueError("filters['rows'] must be a (first, last) pair of integers")
+    return filters
 
 
 class VectorStore:
+    """In-memory vector store backed by a contiguous float32 matrix.
+
+    Rows are L2-normalized when they are added, so cosine similarity at query
+    time is a single matrix-vector product. Capacity grows geometrically to keep
+    appends amortized O(1) without copying the corpus on every add.
+    """
+
+    _INITIAL_CAPACITY = 1024
+    _GROWTH_FACTOR = 2
+    EMBEDDINGS_FILE = "embeddings.npy"
+    CHUNKS_FILE = "chunks.json"
+    # directories of .npy arrays
+    ANN_FILE = "ann"
+    LEXICAL_FILE = "bm25"
+    QUANT_FILE = "quant"
+    _SCORE_BLOCK_ELEMENTS = 1 << 26  # ~256 MB of float32 scores per search_batch block
+    _versions = itertools.count()  # shared, so a replaced store never reuses a version
+    supports_ann = True
+
     def __init__(self):
-        self.embeddings: List[List[float]] = []
-        self.texts: List[str] = []
-        self.metadatas: List[Dict] = []
+        self._matrix = None
+        self._size = 0
+        self.dim = None
+        self.chunks = ChunkStore()  # texts and metadata, row-aligned with the matrix
+        self.ann = None  # optional IVFIndex; search falls back to the exact scan without it
+        self.lexical = None  # optional BM25Index over texts, kept row-aligned with the matrix
+        self.quantizer = None  # optional Codec; when set, searches scan its codes instead of the matrix
+        self.rerank_candidates = 100  # quantized shortlist re-scored with exact rows (0 = approximate scores)
+        self.version = next(self._versions)  # changes on every mutation; used to invalidate caches
+        self._metadata_index_cache = None  # (version, rows per source, first row, last row)
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def texts(self):
+        """Read-only list-like view of the chunk texts."""
+        return self.chunks.texts
+
+    @property
+    def metadatas(self):
+        """Read-only list-like view of the chunk metadata dicts."""
+        return self.chunks.metadatas
+
+    @property
+    def embeddings(self) -> np.ndarray:
+        """Normalized embedding rows currently stored (a view, not a copy)."""
+        if self._matrix is None:
+            return np.empty((0, self.dim or 0), dtype=np.float32)
+        return self._matrix[:self._size]
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def _reserve(self, extra: int):
+        needed = self._size + extra
+        if self._matrix is not None and needed <= self._matrix.shape[0]:
+            return
+        capacity = self._INITIAL_CAPACITY if self._matrix is None else self._matrix.shape[0]
+        while capacity < needed:
+            capacity *= self._GROWTH_FACTOR
+        grown = np.empty((capacity, self.dim), dtype=np.float32)
+        if self._size:
+            grown[:self._size] = self._matrix[:self._size]
+        self._matrix = grown
+
+    def _append_rows(self, vectors) -> None:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors.reshape(1, -1)
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"Embedding dimension mismatch: expected {self.dim}, got {vectors.shape[1]}")
+        self._reserve(vectors.shape[0])
+        self._matrix[self._size:self._size + vectors.shape[0]] = self._normalize(vectors)
+        if self.ann is not None:
+            self.ann.add(self._matrix[self._size:self._size + vectors.shape[0]])
+        if self.quantizer is not None:
+            self.quantizer.add(self._matrix[self._size:self._size + vectors.shape[0]])
+        self._size += vectors.shape[0]
+        self.version = next(self._versions)
 
     def add(self, embedding: List[List[float]], text: str, metadata: Dict = None):
-        self.embeddings.extend(embedding)
-        self.texts.append(text)
-        self.metadatas.append(metadata or {})
+        self._append_rows(embedding)
+        self.chunks.add([text], [metadata])
+        if self.lexical is not None:
+            self.lexical.add([text])
 
-    def search(self, query_embedding: List[List[float]], top_k: int = 5) -> List[Dict]:
-        if not self.embeddings:
-            return []
+    def add_batch(self, embeddings, texts: List[str], metadatas: List[Dict] = None):
+        """Append many rows in one call; ``embeddings`` is an (n, dim) array or list of lists."""
+        rows = embeddings.shape[0] if hasattr(embeddings, "shape") else len(embeddings)
+        if rows != len(texts):
+            raise ValueError(f"Got {rows} embeddings for {len(texts)} texts")
+        if not texts:
+            return
+        self._append_rows(embeddings)
+        self.chunks.add(texts, metadatas)
+        if self.lexical is not None:
+            self.lexical.add(texts)
+
+    def save(self, path: str):
+        """Write the store into directory ``path`` as ``embeddings.npy``, the chunk store and a ``chunks.json`` sidecar.
+
+        Wrap the call in ``atomic_directory`` when readers may load ``path`` concurrently.
+        """
+        os.makedirs(path, exist_ok=True)
+        self._save_matrix(os.path.join(path, self.EMBEDDINGS_FILE))
+        header = self.chunks.save(path)
+        with open(os.path.join(path, self.CHUNKS_FILE), "w", encoding="utf-8") as f:
+            json.dump({"dim": self.dim, "chunks": header}, f, ensure_ascii=False, separators=(",", ":"), default=str)
+        if self.ann is not None:
+            self.ann.save(os.path.join(path, self.ANN_FILE))
+        if self.lexical is not None:
+            self.lexical.save(os.path.join(path, self.LEXICAL_FILE))
+        if self.quantizer is not None:
+            self.quantizer.save(os.path.join(path, self.QUANT_FILE))
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "VectorStore":
+        """Load a store written by ``save``.
+
+        With ``mmap=True`` the embedding matrix, chunk texts and the IVF, BM25 and
+        quantization arrays are memory-mapped read-only, so pages are shared with the OS
+        page cache and other processes instead of copied.
+        The first ``add`` after loading copies the rows into a private, growable buffer.
+        With a quantized index only the codes are read into memory; the float32 rows
+        stay on disk and are paged in only for the re-ranked shortlist.
+        """
+        store = cls()
+        with open(os.path.join(path, cls.CHUNKS_FILE), encoding="utf-8") as f:
+            sidecar = json.load(f)
+        rows = store._load_matrix(os.path.join(path, cls.EMBEDDINGS_FILE), mmap)
+        store.chunks = ChunkStore.load(path, sidecar["chunks"], mmap_text=mmap)
+        if rows != len(store.chunks):
+            raise ValueError(f"Corrupt index at {path}: {rows} embeddings for {len(store.chunks)} texts")
+        store.dim = sidecar["dim"]
+        ann_path = os.path.join(path, cls.ANN_FILE)
+        if os.path.isdir(ann_path):
+            store.ann = IVFIndex.load(ann_path, mmap)
+        lexical_path = os.path.join(path, cls.LEXICAL_FILE)
+        if os.path.isdir(lexical_path):
+            store.lexical = BM25Index.load(lexical_path, mmap)
+        quant_path = os.path.join(path, cls.QUANT_FILE)
+        if os.path.isdir(quant_path):
+            store.quantizer = load_codec(quant_path, mmap)
+        return store
+
+    def _save_matrix(self, path: str):
+        np.save(path, np.ascontiguousarray(self.embeddings))
+
+    def _load_matrix(self, path: str, mmap: bool) -> int:
+        matrix = np.load(path, mmap_mode="r" if mmap else None)
+        if matrix.shape[0]:
+            # size == capacity, so any later append goes through _reserve and copies
+            self._matrix = matrix
+            self._size = matrix.shape[0]
+        return matrix.shape[0]
+
+    @classmethod
+    def exists(cls, path: str) -> bool:
+        return os.path.isfile(os.path.join(path, cls.EMBEDDINGS_FILE)) and \
+            os.path.isfile(os.path.join(path, cls.CHUNKS_FILE))
+
+    def remove_sources(self, sources) -> int:
+        """Drop every row whose metadata ``source`` is in ``sources``; returns the number removed."""
+        sources = set(sources)
+        if not sources or not self._size:
+            return 0
+        values, codes = self.chunks.column('source')
+        dropped = [code for code, value in enumerate(values) if isinstance(value, str) and value in sources]
+        keep = ~np.isin(codes, dropped)
+        removed = int(self._size - keep.sum())
+        if not removed:
+            return 0
+        self._keep_rows(keep)
+        self.chunks.keep(keep)
+        if self.ann is not None:
+            self.ann.keep(keep)
+        if self.lexical is not None:
+            self.lexical.keep(keep)
+        if self.quantizer is not None:
+            self.quantizer.keep(keep)
+        self.version = next(self._versions)
+        return removed
+
+    def _keep_rows(self, keep: np.ndarray):
+        kept_rows = self.embeddings[keep]  # boolean indexing copies, which also detaches a memmap
+        self._matrix = None
+        self._size = 0
+        if kept_rows.shape[0]:
+            self._reserve(kept_rows.shape[0])
+            self._matrix[:kept_rows.shape[0]] = kept_rows
+            self._size = kept_rows.shape[0]
+
+    def build_ann(self, nlist: int = None, nprobe: int = 8, seed: int = 0):
+        """Train an IVF index over the current rows; later adds and removals keep it in sync."""
+        if not self._size:
+            return
+        ann = IVFIndex(nlist or IVFIndex.default_nlist(self._size), nprobe=nprobe, seed=seed)
+        ann.train(self.embeddings)
+        ann.add(self.embeddings)
+        self.ann = ann
+        print(f"Built IVF index: {ann.nlist} lists over {self._size} rows (nprobe={nprobe})")
+
+    def quantize(self, mode: str, **kwargs):
+        """Keep a compressed copy of the rows (``"float16"``, ``"int8"`` or ``"pq"``) and search it.
+
+        ``"none"`` drops the codes again. Extra keyword arguments go to the codec
+        (e.g. ``m`` sub-vectors for PQ). Later adds and removals keep the codes in sync.
+        """
+        if mode in (None, "", "none"):
+            self.quantizer = None
+            return
+        codec = make_codec(mode, **kwargs)
+        if self._size:
+            codec.train(self.embeddings)
+            codec.add(self.embeddings)
+        self.quantizer = codec
+        print(f"Quantized {self._size} rows as {mode}: {codec.nbytes / (1 << 20):.1f} MB of codes "
+              f"(float32 rows: {self._size * (self.dim or 0) * 4 / (1 << 20):.1f} MB)")
+
+    def _query_vector(self, query_embedding) -> np.ndarray:
+        query_vector = np.asarray(query_embedding, dtype=np.float32)
+        if query_vector.ndim > 1:
+            query_vector = query_vector[0]
+        norm = np.linalg.norm(query_vector)
+        return query_vector / norm if norm else query_vector
+
+    def _query_matrix(self, query_embeddings) -> np.ndarray:
+        return self._normalize(np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32)))
+
+    def _scores(self, query_vector, rows=None) -> np.ndarray:
+        """Cosine scores of a normalized query against every row, or only the row ids in ``rows``."""
+        matrix = self.embeddings if rows is None else self.embeddings[rows]
+        # Rows are pre-normalized, so the dot product is the cosine similarity
+        return np.nan_to_num(matrix @ query_vector, nan=0.0)
+
+    def _score_block(self, queries, rows=None) -> np.ndarray:
+        matrix = self.embeddings if rows is None else self.embeddings[rows]
+        return np.nan_to_num(queries @ matrix.T, nan=0.0)
+
+    @staticmethod
+    def _top_k(scores: np.ndarray, top_k: int) -> np.ndarray:
+        if top_k >= scores.shape[0]:
+            return np.argsort(scores)[::-1]
+        candidates = np.argpartition(scores, -top_k)[-top_k:]
+        return candidates[np.argsort(scores[candidates])[::-1]]
+
+    def enable_lexical(self):
+        """Build a BM25 index over the stored texts; later adds and removals keep it in sync."""
+        if self.lexical is None:
+            self.lexical = BM25Index()
+            self.lexical.add(self.texts)
+
+    def _metadata_index(self):
+        """Row ids per source plus tabular row numbers, rebuilt lazily after the store changes."""
+        cached = self._metadata_index_cache
+        if cached is not None and cached[0] == self.version:
+            return cached[1:]
+        # A row's source is the first non-empty of these metadata keys
+        names: Dict[str, int] = {}
+        name_ids = np.full(self._size, -1, dtype=np.int64)
+        for key in ('source', 'file_path', 'filename'):
+            values, codes = self.chunks.column(key)
+            lookup = np.array([names.setdefault(v, len(names)) if v and isinstance(v, str) else -1
+                               for v in values] + [-1], dtype=np.int64)
+            missing = name_ids < 0
+            name_ids[missing] = lookup[codes[missing]]
+        order = np.argsort(name_ids, kind="stable")
+        bounds = np.searchsorted(name_ids[order], np.arange(len(names) + 1))
+        sources = {name: order[bounds[i]:bounds[i + 1]] for name, i in names.items()}
 
-        query_vector = np.array(query_embedding[0])
-        embeddings_matrix = np.array(self.embeddings)
+        first_row = self._int_column('row')
+        last_row = self._int_column('row_end')
+        last_row[last_row < 0] = first_row[last_row < 0]
+        self._metadata_index_cache = (self.version, sources, first_row, last_row)
+        return sources, first_row, last_row
 
-        # Compute cosine similarities with zero division protection
-        dot_products = np.dot(embeddings_matrix, query_vector)
-        norms = np.linalg.norm(embeddings_matrix, axis=1) * np.linalg.norm(query_vector)
+    def _int_column(self, key: str) -> np.ndarray:
+        values, codes = self.chunks.column(key)
+        lookup = np.array([v if v is not None else -1 for v in values] + [-1], dtype=np.int64)
+        return lookup[codes]
 
-        # Avoid division by zero
-        norms = np.where(norms == 0, 1e-10, norms)
-        similarities = dot_products / norms
+    def filter_rows(self, sources=None, file_types=None, rows=None) -> np.ndarray:
+        """Sorted ids of the rows matching every given filter, or None when no filter is given.
 
-        # Replace NaN with 0
-        similarities = np.nan_to_num(similarities, nan=0.0)
+        ``sources`` are source paths or file names, ``file_types`` extensions such as
+        ``".csv"``, and ``rows`` an inclusive ``(first, last)`` range of tabular row numbers
+        that a chunk's ``row``..``row_end`` must overlap.
+        """
+        if sources is None and file_types is None and rows is None:
+            return None
+        by_source, first_row, last_row = self._metadata_index()
+        selected = None
+        if sources is not None or file_types is not None:
+            wanted = list(by_source)
+            if sources is not None:
+                names = set(sources)
+                wanted = [s for s in wanted if s in names or os.path.basename(s) in names]
+            if file_types is not None:
+                types = {("." + t.lstrip(".")).lower() for t in file_types}
+                wanted = [s for s in wanted if os.path.splitext(s)[1].lower() in types]
+            parts = [by_source[s] for s in wanted]
+            selected = np.sort(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int64)
+        if rows is not None:
+            first, last = rows
+            in_range = (first_row >= 0) & (last_row >= first) & (first_row <= last)
+            selected = np.flatnonzero(in_range) if selected is None else selected[in_range[selected]]
+        return selected
 
-        # Get top_k indices
-        top_k_indices = np.argsort(similarities)[-top_k:][::-1]
+    def rank(self, query_embedding, top_k: int, exact: bool = False, nprobe: int = None, rows=None):
+        """Row ids and cosine scores of the ``top_k`` best rows, best first.
 
+        Uses the IVF index when one is built unless ``exact`` is set; ``nprobe``
+        overrides the index's recall/latency setting for this query. With ``rows``
+        (from ``filter_rows``) only those rows are scored. Unless ``exact`` is set, a
+        quantized store scores the candidates from its codes and re-ranks the best
+        ``rerank_candidates`` of them with the float32 rows.
+        """
+        query_vector = self._query_vector(query_embedding)
+        if self.quantizer is not None and not exact:
+            if rows is None and self.ann is not None:
+                rows = self.ann.candidates(query_vector, nprobe=nprobe)
+            return self._rank_quantized(query_vector, top_k, rows)
+        if rows is not None:
+            scores = self._scores(query_vector, rows)
+            best = self._top_k(scores, top_k)
+            return rows[best], scores[best]
+        if self.ann is not None and not exact:
+            candidates = self.ann.candidates(query_vector, nprobe=nprobe)
+            scores = self._scores(query_vector, candidates)
+            best = self._top_k(scores, top_k)
+            return candidates[best], scores[best]
+
+        similarities = self._scores(query_vector)
+        best = self._top_k(similarities, top_k)
+        return best, similarities[best]
+
+    def _rank_quantized(self, query_vector, top_k: int, rows=None):
+        approx = self.quantizer.scores(query_vector, rows)
+        if not self.rerank_candidates:
+            best = self._top_k(approx, top_k)
+            return (best if rows is None else rows[best]), approx[best]
+        shortlist = self._top_k(approx, max(top_k, self.rerank_candidates))
+        # sorted ids read the (possibly memory-mapped) rows in file order
+        ids = np.sort(shortlist if rows is None else rows[shortlist])
+        scores = self._scores(query_vector, ids)
+        best = self._top_k(scores, top_k)
+        return ids[best], scores[best]
+
+    def _results(self, indices, scores) -> List[Dict]:
         # Return both text and metadata
         return [
             {
+                'id': int(i),
                 'text': self.texts[i],
                 'metadata': self.metadatas[i],
-                'score': float(similarities[i])
+                'score': float(score)
             }
-            for i in top_k_indices
+            for i, score in zip(indices, scores)
         ]
 
+    def search(self, query_embedding: List[List[float]], top_k: int = 5, exact: bool = False,
+               nprobe: int = None, filters: Dict = None) -> List[Dict]:
+        """Best ``top_k`` rows; ``filters`` takes the keyword arguments of ``filter_rows``."""
+        if not self._size or top_k <= 0:
+            return []
+
+        rows = self.filter_rows(**check_filters(filters))
+        indices, scores = self.rank(query_embedding, top_k, exact=exact, nprobe=nprobe, rows=rows)
+        return self._results(indices, scores)
+
+    def search_lexical(self, query_text: str, top_k: int = 5, filters: Dict = None) -> List[Dict]:
+        """BM25 keyword search; only rows sharing at least one term with the query are returned."""
+        if self.lexical is None:
+            raise ValueError("No lexical index; call enable_lexical() first")
+        rows = self.filter_rows(**check_filters(filters))
+        indices, scores = self.lexical.search(query_text, top_k, rows=rows)
+        results = self._results(indices, scores)
+        for result in results:
+            result['lexical_score'] = result['score']
+        return results
+
+    def search_hybrid(self, query_embedding, query_text: str, top_k: int = 5, candidates: int = None,
+                      rrf_k: int = 60, filters: Dict = None) -> List[Dict]:
+        """Fuse dense and BM25 rankings with reciprocal rank fusion.
+
+        Each side contributes its best ``candidates`` rows (default ``4 * top_k``).
+        ``score`` is the fused score; ``dense_score`` (cosine) and ``lexical_score``
+        (BM25, 0 when the row shares no query term) are reported alongside.
+        """
+        if not self._size or top_k <= 0:
+            return []
+        if self.lexical is None:
+            raise ValueError("No lexical index; call enable_lexical() first")
+        candidates = candidates or max(4 * top_k, 20)
+        rows = self.filter_rows(**check_filters(filters))
+        dense_ids, dense_scores = self.rank(query_embedding, candidates, rows=rows)
+        lexical_ids, lexical_scores = self.lexical.search(query_text, candidates, rows=rows)
+        fused = reciprocal_rank_fusion([dense_ids, lexical_ids], k=rrf_k)
+        best = sorted(fused, key=fused.get, reverse=True)[:top_k]
+
+        dense = dict(zip(dense_ids.tolist(), dense_scores.tolist()))
+        lexical = dict(zip(lexical_ids.tolist(), lexical_scores.tolist()))
+        query_vector = self._query_vector(query_embedding)
+        results = self._results(best, [fused[i] for i in best])
+        for result in results:
+            i = result['id']
+            result['dense_score'] = dense[i] if i in dense else float(self._scores(query_vector, [i])[0])
+            result['lexical_score'] = lexical.get(i, 0.0)
+        return results
+
+    def search_batch(self, query_embeddings, top_k: int = 5, exact: bool = False,
+                     nprobe: int = None, filters: Dict = None) -> List[List[Dict]]:
+        """``search`` for many queries at once.
+
+        The exact path scores a block of queries against all rows with one matrix-matrix
+        product and selects each row's top-k with a row-wise argpartition; blocks are sized
+        so the score matrix stays around ``_SCORE_BLOCK_ELEMENTS`` floats. With an IVF index
+        each query probes its own cells, and a quantized store ranks each query with
+        ``rank``. ``filters`` applies to every query.
+        """
+        if (query_embeddings.shape[0] if hasattr(query_embeddings, "shape") else len(query_embeddings)) == 0:
+            return []
+        queries = self._query_matrix(query_embeddings)
+        if not self._size or top_k <= 0:
+            return [[] for _ in range(queries.shape[0])]
+        rows = self.filter_rows(**check_filters(filters))
+        if self.quantizer is not None and not exact:
+            return [self._results(*self.rank(q, top_k, nprobe=nprobe, rows=rows)) for q in queries]
+        if self.ann is not None and not exact and rows is None:
+            return [self.search(q, top_k, nprobe=nprobe) for q in queries]
+
+        candidates = self._size if rows is None else rows.shape[0]
+        if not candidates:
+            return [[] for _ in range(queries.shape[0])]
+        k = min(top_k, candidates)
+        block = max(1, self._SCORE_BLOCK_ELEMENTS // candidates)
+        results = []
+        for start in range(0, queries.shape[0], block):
+            scores = self._score_block(queries[start:start + block], rows)
+            if k < candidates:
+                top = np.argpartition(scores, -k, axis=1)[:, -k:]
+            else:
+                top = np.broadcast_to(np.arange(candidates), scores.shape)
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            order = np.argsort(-top_scores, axis=1)
+            top = np.take_along_axis(top, order, axis=1)
+            top_scores = np.take_along_axis(top_scores, order, axis=1)
+            if rows is not None:
+                top = rows[top]
+            results.extend(self._results(ids, row_scores) for ids, row_scores in zip(top, top_scores))
+        return results
+
     def get_all_sources(self) -> List[str]:
         """Get list of unique source documents"""
-        sources = set()
-        for meta in self.metadatas:
-            if isinstance(meta, dict):
-                # Try common metadata keys
-                src = meta.get('source') or meta.get('file_path') or meta.get('filename')
-                if src:
-                    sources.add(src)
-        return list(sources)
\ No newline at end of file
+        return list(self._metadata_index()[0])
+
+
+class SparseVectorStore(VectorStore):
+    """``VectorStore`` over sparse (e.g. hashed n-gram) embeddings kept as a scipy CSR matrix.
+
+    Rows are L2-normalized on add and scored with sparse dot products, so memory and
+    query cost scale with the number of non-zero terms rather than the feature count.
+    Appended batches are buffered and stacked into one CSR matrix on the next read.
+    There is no IVF index for sparse rows; ``search`` is always exact.
+    """
+
+    EMBEDDINGS_FILE = "embeddings_sparse"  # directory of the CSR arrays as .npy files
+    supports_ann = False
+
+    def __init__(self):
+        super().__init__()
+        self._csr = None
+        self._pending: List[sp.csr_matrix] = []
+
+    @property
+    def embeddings(self) -> sp.csr_matrix:
+        if self._pending:
+            blocks = ([self._csr] if self._csr is not None else []) + self._pending
+            self._csr = sp.vstack(blocks, format="csr", dtype=np.float32)
+            self._pending = []
+        if self._csr is None:
+            return sp.csr_matrix((0, self.dim or 0), dtype=np.float32)
+        return self._csr
+
+    @staticmethod
+    def _normalize(vectors: sp.csr_matrix) -> sp.csr_matrix:
+        vectors = sp.csr_matrix(vectors, dtype=np.float32, copy=True)
+        norms = np.sqrt(np.asarray(vectors.multiply(vectors).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        # scale each row's stored values in place; a diagonal matmul costs O(columns) per call
+        vectors.data /= np.repeat(norms, np.diff(vectors.indptr)).astype(np.float32)
+        return vectors
+
+    def _append_rows(self, vectors) -> None:
+        vectors = sp.csr_matrix(vectors, dtype=np.float32)
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"Embedding dimension mismatch: expected {self.dim}, got {vectors.shape[1]}")
+        self._pending.append(self._normalize(vectors))
+        self._size += vectors.shape[0]
+        self.version = next(self._versions)
+
+    def _save_matrix(self, path: str):
+        matrix = self.embeddings
+        save_arrays(path, data=matrix.data, indices=matrix.indices, indptr=matrix.indptr,
+                    shape=np.array(matrix.shape, dtype=np.int64))
+
+    def _load_matrix(self, path: str, mmap: bool) -> int:
+        arrays = load_arrays(path, mmap)
+        # the CSR matrix wraps the mapped arrays without copying; adds and removals build new ones
+        self._csr = sp.csr_matrix((arrays['data'], arrays['indices'], arrays['indptr']),
+                                  shape=tuple(int(n) for n in arrays['shape']), copy=False)
+        self._size = self._csr.shape[0]
+        return self._size
+
+    @classmethod
+    def exists(cls, path: str) -> bool:
+        return os.path.isdir(os.path.join(path, cls.EMBEDDINGS_FILE)) and \
+            os.path.isfile(os.path.join(path, cls.CHUNKS_FILE))
+
+    def _keep_rows(self, keep: np.ndarray):
+        self._csr = self.embeddings[keep]
+        self._size = self._csr.shape[0]
+
+    def build_ann(self, nlist: int = None, nprobe: int = 8, seed: int = 0):
+        raise ValueError("IVF indexing needs dense embeddings; sparse stores are searched exactly")
+
+    def quantize(self, mode: str, **kwargs):
+        if mode not in (None, "", "none"):
+            raise ValueError("Quantization needs dense embeddings; sparse rows are already compact")
+        self.quantizer = None
+
+    def _query_vector(self, query_embedding) -> sp.csr_matrix:
+        return self._normalize(sp.csr_matrix(query_embedding, dtype=np.float32)[0])
+
+    def _query_matrix(self, query_embeddings) -> sp.csr_matrix:
+        if isinstance(query_embeddings, (list, tuple)):
+            query_embeddings = sp.vstack(query_embeddings, format="csr")
+        return self._normalize(sp.csr_matrix(query_embeddings, dtype=np.float32))
+
+    def _scores(self, query_vector, rows=None) -> np.ndarray:
+        matrix = self.embeddings if rows is None else self.embeddings[rows]
+        return (matrix @ query_vector.T).toarray().ravel()
+
+    def _score_block(self, queries, rows=None) -> np.ndarray:
+        matrix = self.embeddings if rows is None else self.embeddings[rows]
+        return (queries @ matrix.T).toarray()
@@ -0,0 +1,31 @@
+import numpy as np
+from src.ann_index import IVFIndex, recall_at_k
+from src.vector_store import VectorStore
+
+
+def _store(n: int = 5000, dim: int = 32, clusters: int = 50, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    labels = rng.integers(0, clusters, n)
+    vectors = (centers[labels] + 0.4 * rng.normal(size=(n, dim))).astype(np.float32)
+    store = VectorStore()
+    store.add_batch(vectors, [str(i) for i in range(n)])
+    queries = (centers[rng.integers(0, clusters, 50)] + 0.4 * rng.normal(size=(50, dim))).astype(np.float32)
+    return store, queries
+
+
+def test_ivf_recall_against_brute_force():
+    store, queries = _store()
+    store.build_ann(nlist=IVFIndex.default_nlist(len(store)), nprobe=16, seed=0)
+    assert recall_at_k(store, queries, k=10) >= 0.98
+    # fewer probes trade recall for speed
+    assert recall_at_k(store, queries, k=10, nprobe=2) < recall_at_k(store, queries, k=10, nprobe=8)
+    # probing every list is an exact search
+    assert recall_at_k(store, queries, k=10, nprobe=store.ann.nlist) == 1.0
+
+
+def test_ivf_candidates_cover_every_row_once():
+    store, _ = _store(n=1000)
+    store.build_ann(nlist=20, nprobe=20)
+    candidates = store.ann.candidates(store.embeddings[0])
+    assert np.array_equal(np.sort(candidates), np.arange(len(store)))
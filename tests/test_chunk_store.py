@@ -0,0 +1,62 @@
+import numpy as np
+from src.chunk_store import ChunkStore
+from src.document_loader import _iter_file_chunks
+from src.vector_store import VectorStore
+
+
+def _split(tmp_path, text: str):
+    path = tmp_path / "report.txt"
+    path.write_text(text, encoding="utf-8")
+    chunks = list(_iter_file_chunks(str(path)))
+    return [c.page_content for c in chunks], [c.metadata for c in chunks]
+
+
+def test_overlapping_splitter_output_round_trips(tmp_path):
+    rng = np.random.default_rng(0)
+    words = ["revenue", "grew", "naïve", "café", "日本", "report", "quarter", "€12m"]
+    # one long paragraph, so the splitter cuts between words and consecutive chunks overlap
+    texts, metadatas = _split(tmp_path, " ".join(rng.choice(words, 2000)))
+    assert len(texts) > 5
+
+    store = ChunkStore()
+    store.add(texts, metadatas)
+    assert list(store.texts) == texts
+    assert list(store.metadatas) == metadatas
+    # the splitter's overlap is stored once
+    stored = sum(len(buffer) for buffer in store._buffers)
+    assert stored < 0.85 * sum(len(t.encode("utf-8")) for t in texts)
+
+    header = store.save(str(tmp_path))
+    loaded = ChunkStore.load(str(tmp_path), header)
+    assert list(loaded.texts) == texts
+
+
+def test_identical_chunks_are_deduplicated():
+    store = ChunkStore()
+    store.add(["alpha row", "beta row"], [{'source': "a.csv"}, {'source': "a.csv"}])
+    texts = ["alpha row", "gamma row", "gamma row", "alpha row"]
+    metadatas = [{'source': "a.csv"}, {'source': "a.csv"}, {'source': "a.csv"}, {'source': "b.csv"}]
+    # already stored for a.csv, repeated within the batch, and new for b.csv
+    assert store.unseen(texts, metadatas) == [1, 3]
+
+
+def test_remove_sources_keeps_indexes_aligned():
+    rng = np.random.default_rng(1)
+    sources = ["a.txt", "b.txt", "c.txt"]
+    texts = [f"chunk{i} term{i} shared words" for i in range(300)]
+    metadatas = [{'source': sources[i % 3]} for i in range(300)]
+    store = VectorStore()
+    store.add_batch(rng.normal(size=(300, 16)).astype(np.float32), texts, metadatas)
+    store.build_ann(nlist=8, nprobe=8)
+    store.enable_lexical()
+    store.quantize("int8")
+
+    assert store.remove_sources(["b.txt"]) == 100
+    kept = [i for i in range(300) if i % 3 != 1]
+    assert list(store.texts) == [texts[i] for i in kept]
+    assert len(store.ann) == len(store.lexical) == len(store.quantizer) == len(store) == 200
+    assert np.array_equal(store.ann.assignments, store.ann._assign(store.embeddings))
+    assert np.array_equal(store.quantizer.codes, store.quantizer.encode(np.asarray(store.embeddings)))
+    for row in (0, 57, 199):
+        ids, _ = store.lexical.search(f"term{kept[row]}", top_k=1)
+        assert ids.tolist() == [row]
@@ -0,0 +1,26 @@
+import json
+import pytest
+from src.embeddings import EmbeddingManager
+
+
+@pytest.fixture
+def manager():
+    manager = EmbeddingManager()
+    if not manager.is_sparse:
+        pytest.skip("a sentence-transformers model is installed; the hashed fallback is not in use")
+    return manager
+
+
+def test_vectorizer_round_trips_as_json(manager, tmp_path):
+    manager.save(str(tmp_path))
+    with open(tmp_path / EmbeddingManager.VECTORIZER_FILE, encoding="utf-8") as f:
+        params = json.load(f)
+    assert params['ngram_range'] == [1, 2]
+
+    params['n_features'] = 4096
+    with open(tmp_path / EmbeddingManager.VECTORIZER_FILE, "w", encoding="utf-8") as f:
+        json.dump(params, f)
+    reloaded = EmbeddingManager()
+    reloaded.load(str(tmp_path))
+    assert reloaded.embed(["quarterly revenue"]).shape == (1, 4096)
+
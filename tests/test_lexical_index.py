@@ -0,0 +1,29 @@
+import numpy as np
+from src.lexical_index import BM25Index
+
+
+def test_single_document_corpus_matches():
+    index = BM25Index()
+    index.add(["Quarterly revenue grew in the northern region"])
+    ids, scores = index.search("revenue", top_k=5)
+    assert ids.tolist() == [0]
+    assert scores[0] > 0
+
+
+def test_term_in_most_documents_still_matches():
+    index = BM25Index()
+    index.add(["the budget for marketing", "the budget for hiring", "office plants need water"])
+    ids, scores = index.search("budget", top_k=5)
+    assert sorted(ids.tolist()) == [0, 1]
+    assert np.all(scores > 0)
+
+
+def test_common_terms_skipped_only_on_large_corpora():
+    index = BM25Index()
+    index.add([f"common filler text number{i}" for i in range(BM25Index._MAX_DF_MIN_DOCS)])
+    index.add(["common rare"])
+    ids, _ = index.search("common rare", top_k=3)
+    assert ids.tolist() == [BM25Index._MAX_DF_MIN_DOCS]
+    # a query made only of common terms falls back to using them
+    ids, _ = index.search("common", top_k=3)
+    assert len(ids) == 3
@@ -0,0 +1,112 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from src import llm
+from src.rag_pipeline import RAGPipeline
+
+PROMPT = RAGPipeline._build_prompt("How much did revenue grow?", ["Revenue grew 12% in Q3."])
+TOKENS = ["Revenue ", "grew ", "12%."]
+
+
+class _MockEndpoint(BaseHTTPRequestHandler):
+    """OpenAI-compatible chat endpoint that rate-limits every other request."""
+
+    requests = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.requests.append(body)
+        if len(self.requests) % 2:
+            self._send(429, {'error': {'message': "slow down"}}, {'Retry-After': "0"})
+        elif body.get("stream"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            for token in TOKENS:
+                chunk = {'id': "c", 'object': "chat.completion.chunk", 'created': 0, 'model': body["model"],
+                         'choices': [{'index': 0, 'delta': {'content': token}, 'finish_reason': None}]}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+            self.wfile.write(b"data: [DONE]\n\n")
+        else:
+            self._send(200, {'id': "c", 'object': "chat.completion", 'created': 0, 'model': body["model"],
+                             'choices': [{'index': 0, 'finish_reason': "stop",
+                                          'message': {'role': "assistant", 'content': "".join(TOKENS)}}]})
+
+    def _send(self, status, payload, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        for name, value in {'Content-Type': "application/json", 'Content-Length': str(len(data)),
+                            **(headers or {})}.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def endpoint(monkeypatch):
+    _MockEndpoint.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _MockEndpoint)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    # what LLM_BASE_URL sets on import
+    monkeypatch.setattr(llm, "base_url", f"http://127.0.0.1:{server.server_address[1]}")
+    monkeypatch.setattr(llm, "DATABRICKS_TOKEN", "token")
+    monkeypatch.setattr(llm, "LLM_MAX_RETRIES", 1)
+    monkeypatch.setattr(llm, "_client", None)
+    yield _MockEndpoint.requests
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def no_credentials(monkeypatch):
+    monkeypatch.setattr(llm, "DATABRICKS_TOKEN", "")
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    monkeypatch.setattr(llm, "_client", None)
+
+
+def test_missing_token_falls_back_to_context(no_credentials):
+    expected = llm.generate_fallback_answer(PROMPT)
+    assert "Revenue grew 12% in Q3." in expected
+    assert llm.generate_answer(PROMPT) == expected
+    assert asyncio.run(llm.agenerate_answer(PROMPT)) == expected
+
+    async def stream():
+        return [token async for token in llm.astream_answer(PROMPT)]
+
+    assert asyncio.run(stream()) == [expected]
+
+
+def test_rate_limited_requests_are_retried(endpoint):
+    assert llm.generate_answer(PROMPT) == "".join(TOKENS)
+    assert list(llm.stream_answer(PROMPT)) == TOKENS
+
+    async def scenario():
+        try:
+            answer = await llm.agenerate_answer(PROMPT)
+            return answer, [token async for token in llm.astream_answer(PROMPT)]
+        finally:
+            await llm.close_async_client()
+
+    assert asyncio.run(scenario()) == ("".join(TOKENS), TOKENS)
+    assert len(endpoint) == 8
+    assert [request.get("stream") for request in endpoint[1::2]] == [False, True, False, True]
+    assert endpoint[1]["messages"][-1]["content"] == PROMPT
+
+
+def test_async_client_is_closed_with_its_loop(monkeypatch):
+    monkeypatch.setattr(llm, "DATABRICKS_TOKEN", "token")
+
+    async def use_and_close():
+        client, _ = llm.get_async_client()
+        await llm.close_async_client()
+        return client, asyncio.get_running_loop() in llm._async_clients
+
+    client, still_registered = asyncio.run(use_and_close())
+    assert client.is_closed()
+    assert not still_registered
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+from src.vector_store import VectorStore
+
+
+def _clustered(n: int, dim: int = 48, clusters: int = 32, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    return (centers[rng.integers(0, clusters, n)] + 0.3 * rng.normal(size=(n, dim))).astype(np.float32)
+
+
+@pytest.mark.parametrize("mode", ["float16", "int8", "pq"])
+def test_quantizing_an_empty_store_fits_on_first_add(mode):
+    store = VectorStore()
+    store.quantize(mode, **({'m': 8} if mode == "pq" else {}))
+    vectors = _clustered(300)
+    store.add_batch(vectors, [f"chunk {i}" for i in range(300)])
+    assert len(store.quantizer) == 300
+    ids, _ = store.rank(vectors[7], top_k=1)
+    assert ids[0] == 7
+
+
+def test_pq_recall_needs_reranking():
+    vectors = _clustered(4000, seed=1)
+    queries = _clustered(50, seed=2)
+    store = VectorStore()
+    store.add_batch(vectors, [str(i) for i in range(len(vectors))])
+    store.quantize("pq", m=8)
+
+    def recall(rerank: int) -> float:
+        store.rerank_candidates = rerank
+        hits = 0
+        for query in queries:
+            exact, _ = store.rank(query, 10, exact=True)
+            approx, _ = store.rank(query, 10)
+            hits += len(np.intersect1d(exact, approx))
+        return hits / (10 * len(queries))
+
+    assert recall(400) >= 0.95
+    assert recall(400) > recall(0)
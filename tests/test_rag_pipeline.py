@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+from benchmarks.stubs import StubEmbedder, StubLLM
+from src import rag_pipeline
+
+
+@pytest.fixture
+def pipeline(tmp_path, monkeypatch):
+    llm = StubLLM(latency=0.01)
+    for name, function in (("generate_answer", llm.generate), ("stream_answer", llm.stream),
+                           ("agenerate_answer", llm.agenerate)):
+        monkeypatch.setattr(rag_pipeline, name, function)
+    (tmp_path / "notes.txt").write_text(
+        "The quarterly report shows revenue growth in the northern region.\n\n"
+        "Shipping delays were caused by a shortage of containers at the port.\n")
+    pipeline = rag_pipeline.RAGPipeline(embedding_manager=StubEmbedder(dim=32))
+    pipeline.retrieval_mode = "dense"
+    pipeline.ingest_documents(str(tmp_path), progress=lambda info: None)
+    pipeline.llm = llm
+    return pipeline
+
+
+def test_empty_batches_return_no_results(pipeline):
+    assert pipeline.vector_store.search_batch([]) == []
+    assert pipeline.vector_store.search_batch(np.zeros((0, 32), dtype=np.float32)) == []
+    assert pipeline.retrieve_batch([]) == []
+    assert pipeline.query_batch([]) == []
+
+
+def test_repeated_questions_are_generated_once(pipeline):
+    questions = ["What caused the shipping delays?", "what caused the  SHIPPING delays?",
+                 "What caused the shipping delays?"]
+    results = pipeline.query_batch(questions)
+    assert pipeline.llm.calls == 1
+    assert len(results) == 3
+    assert len({result['answer'] for result in results}) == 1
+    assert results[0] is not results[1]
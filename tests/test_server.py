@@ -0,0 +1,54 @@
+import asyncio
+import json
+import time
+import pytest
+from src.server import HTTPError, QueryService
+
+
+def _body(**request) -> bytes:
+    return json.dumps({'question': "what changed?", **request}).encode("utf-8")
+
+
+@pytest.mark.parametrize("filters", [
+    {'bogus': 1},
+    {'rows': 5},
+    {'rows': [1, 2, 3]},
+    {'rows': ["a", "b"]},
+    {'sources': "report.pdf"},
+    {'file_types': [1]},
+    ["report.pdf"],
+])
+def test_bad_filters_are_rejected_with_400(filters):
+    with pytest.raises(HTTPError) as error:
+        QueryService._question_request(_body(filters=filters))
+    assert error.value.status == 400
+
+
+def test_valid_filters_are_accepted():
+    request = QueryService._question_request(
+        _body(filters={'sources': ["report.pdf"], 'file_types': [".csv"], 'rows': [0, 99]}))
+    assert request['filters']['rows'] == [0, 99]
+
+
+class _SlowPipeline:
+    def retrieve_batch(self, questions, filters=None):
+        time.sleep(0.5)
+        return [[] for _ in questions]
+
+
+def test_search_batch_does_not_block_the_event_loop():
+    async def scenario():
+        service = QueryService(index_path="/nonexistent", window=0.001, max_batch=8)
+        service.pipeline = _SlowPipeline()
+        search = asyncio.ensure_future(service.dispatch("POST", "/search", _body()))
+        await asyncio.sleep(0.05)
+        started = time.perf_counter()
+        health = await service.dispatch("GET", "/healthz", b"")
+        health_seconds = time.perf_counter() - started
+        assert (await search) == {'chunks': []}
+        service.executor.shutdown()
+        return health, health_seconds
+
+    health, health_seconds = asyncio.run(scenario())
+    assert health['status'] == "ok"
+    assert health_seconds < 0.2